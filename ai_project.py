@@ -1,603 +1,724 @@
-import pygame
-import sys
-import math
-from copy import deepcopy
-
-# Initialize pygame
-pygame.init()
-
-# Constants
-WIDTH, HEIGHT = 680, 680
-ROWS, COLS = 10, 10  # 10x10 board
-SQUARE_SIZE = WIDTH // COLS
-
-# Colors
-RED = (255, 0, 0)
-WHITE = (255, 255, 255)
-BLACK = (0, 0, 0)
-BLUE = (0, 0, 255)
-GREY = (128, 128, 128)
-CROWN = (255, 215, 0)  # Gold color for kings
-GREEN = (0, 255, 0)
-YELLOW = (255, 255, 0)
-PURPLE = (128, 0, 128)
-BROWN = (211, 84, 0)
-
-# Setup the display
-WIN = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption('Checker Game')
-
-class Piece:
-    PADDING = 12  # Slightly smaller padding for 10x10
-    OUTLINE = 2
-
-    def __init__(self, row, col, color):
-        self.row = row
-        self.col = col
-        self.color = color
-        self.king = False
-        self.x = 0
-        self.y = 0
-        self.calc_pos()
-
-    def calc_pos(self):
-        self.x = SQUARE_SIZE * self.col + SQUARE_SIZE // 2
-        self.y = SQUARE_SIZE * self.row + SQUARE_SIZE // 2
-
-    def make_king(self):
-        self.king = True
-
-    def draw(self, win):
-        radius = SQUARE_SIZE // 2 - self.PADDING
-        pygame.draw.circle(win, GREY, (self.x, self.y), radius + self.OUTLINE)
-        pygame.draw.circle(win, self.color, (self.x, self.y), radius)
-        if self.king:
-            # Draw crown symbol for kings
-            pygame.draw.circle(win, CROWN, (self.x, self.y), radius // 1.8)
-            # Add star points to make crown more visible
-            for i in range(5):
-                angle = 2 * math.pi * i / 5 - math.pi / 2
-                outer_x = self.x + (radius // 2) * 0.8 * math.cos(angle)
-                outer_y = self.y + (radius // 2) * 0.8 * math.sin(angle)
-                inner_x = self.x + (radius // 3) * math.cos(angle + math.pi / 5)
-                inner_y = self.y + (radius // 3) * math.sin(angle + math.pi / 5)
-                pygame.draw.polygon(win, CROWN, [
-                    (self.x, self.y),
-                    (outer_x, outer_y),
-                    (inner_x, inner_y)
-                ])
-
-    def move(self, row, col):
-        self.row = row
-        self.col = col
-        self.calc_pos()
-
-    def __repr__(self):
-        return str(self.color)
-
-class Board:
-    def __init__(self):
-        self.board = []
-        self.red_left = self.white_left = 20  # 20 pieces each for 10x10
-        self.red_kings = self.white_kings = 0
-        self.create_board()
-
-    def draw_squares(self, win):
-        win.fill(BLACK)
-        for row in range(ROWS):
-            for col in range(row % 2, ROWS, 2):
-                pygame.draw.rect(win, WHITE, (row * SQUARE_SIZE, col * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE))
-
-    def evaluate(self):
-        return enhanced_evaluate(self)
-
-    def get_all_pieces(self, color):
-        pieces = []
-        for row in self.board:
-            for piece in row:
-                if piece != 0 and piece.color == color:
-                    pieces.append(piece)
-        return pieces
-
-    def move(self, piece, row, col):
-        self.board[piece.row][piece.col], self.board[row][col] = self.board[row][col], self.board[piece.row][piece.col]
-        piece.move(row, col)
-
-        if row == ROWS - 1 or row == 0:
-            if not piece.king:  # Only promote if not already a king
-                piece.make_king()
-                if piece.color == WHITE:
-                    self.white_kings += 1
-                else:
-                    self.red_kings += 1
-
-    def get_piece(self, row, col):
-        return self.board[row][col]
-
-    def create_board(self):
-        for row in range(ROWS):
-            self.board.append([])
-            for col in range(COLS):
-                if col % 2 == ((row + 1) % 2):
-                    if row < 4:
-                        self.board[row].append(Piece(row, col, WHITE))
-                    elif row > 5:
-                        self.board[row].append(Piece(row, col, RED))
-                    else:
-                        self.board[row].append(0)
-                else:
-                    self.board[row].append(0)
-
-    def draw(self, win):
-        self.draw_squares(win)
-        for row in range(ROWS):
-            for col in range(COLS):
-                piece = self.board[row][col]
-                if piece != 0:
-                    piece.draw(win)
-
-    def remove(self, pieces):
-        for piece in pieces:
-            if piece != 0:
-                self.board[piece.row][piece.col] = 0
-                if piece.color == RED:
-                    self.red_left -= 1
-                else:
-                    self.white_left -= 1
-
-    def winner(self):
-        if self.red_left <= 0:
-            return WHITE
-        elif self.white_left <= 0:
-            return RED
-        
-        # Check for no valid moves (stalemate)
-        red_has_moves = any(self.all_valid_moves(RED).values())
-        white_has_moves = any(self.all_valid_moves(WHITE).values())
-        
-        if not red_has_moves:
-            return WHITE
-        if not white_has_moves:
-            return RED
-        
-        return None
-        
-    def all_valid_moves(self, color):
-        moves = {}
-        for piece in self.get_all_pieces(color):
-            valid_moves = self.get_valid_moves(piece)
-            if valid_moves:
-                moves[piece] = valid_moves
-        return moves
-
-    def get_valid_moves(self, piece):
-        moves = {}
-        left = piece.col - 1
-        right = piece.col + 1
-        row = piece.row
-
-        if piece.color == RED or piece.king:
-            moves.update(self._traverse_left(row - 1, max(row - 3, -1), -1, piece.color, left))
-            moves.update(self._traverse_right(row - 1, max(row - 3, -1), -1, piece.color, right))
-
-        if piece.color == WHITE or piece.king:
-            moves.update(self._traverse_left(row + 1, min(row + 3, ROWS), 1, piece.color, left))
-            moves.update(self._traverse_right(row + 1, min(row + 3, ROWS), 1, piece.color, right))
-
-        return moves
-
-    def _traverse_left(self, start, stop, step, color, left, skipped=[]):
-        moves = {}
-        last = []
-        for r in range(start, stop, step):
-            if left < 0:
-                break
-
-            current = self.board[r][left]
-            if current == 0:
-                if skipped and not last:
-                    break
-                elif skipped:
-                    moves[(r, left)] = last + skipped
-                else:
-                    moves[(r, left)] = last
-
-                if last:
-                    if step == -1:
-                        row = max(r - 3, -1)
-                    else:
-                        row = min(r + 3, ROWS)
-                    moves.update(self._traverse_left(r + step, row, step, color, left - 1, skipped=last))
-                    moves.update(self._traverse_right(r + step, row, step, color, left + 1, skipped=last))
-                break
-            elif current.color == color:
-                break
-            else:
-                last = [current]
-
-            left -= 1
-
-        return moves
-
-    def _traverse_right(self, start, stop, step, color, right, skipped=[]):
-        moves = {}
-        last = []
-        for r in range(start, stop, step):
-            if right >= COLS:
-                break
-
-            current = self.board[r][right]
-            if current == 0:
-                if skipped and not last:
-                    break
-                elif skipped:
-                    moves[(r, right)] = last + skipped
-                else:
-                    moves[(r, right)] = last
-
-                if last:
-                    if step == -1:
-                        row = max(r - 3, -1)
-                    else:
-                        row = min(r + 3, ROWS)
-                    moves.update(self._traverse_left(r + step, row, step, color, right - 1, skipped=last))
-                    moves.update(self._traverse_right(r + step, row, step, color, right + 1, skipped=last))
-                break
-            elif current.color == color:
-                break
-            else:
-                last = [current]
-
-            right += 1
-
-        return moves
-
-class Game:
-    def __init__(self, win):
-        self._init()
-        self.win = win
-        self.font = pygame.font.SysFont('comic sans', 70)
-        self.small_font = pygame.font.SysFont('comic sans', 40)
-        self.medium_font = pygame.font.SysFont('comic sans', 50)
-        self.ai_thinking = False
-        self.last_move_time = 0
-        self.move_delay = 500  # milliseconds
-
-    def update(self):
-        self.board.draw(self.win)
-        self.draw_valid_moves(self.valid_moves)
-        self.draw_turn_indicator()
-        if self.ai_thinking:
-            self.draw_thinking_text()
-        if self.game_over:
-            self.draw_game_over()
-        pygame.display.update()
-
-
-    def _init(self):
-        self.selected = None
-        self.board = Board()
-        self.turn = RED
-        self.valid_moves = {}
-        self.game_over = False
-        self.winner = None
-        self.ai_thinking = False
-
-    def get_winner(self):
-        return self.board.winner()
-
-    def reset(self):
-        self._init()
-
-    def select(self, row, col):
-        if self.selected:
-            result = self._move(row, col)
-            if not result:
-                self.selected = None
-                self.select(row, col)
-        
-        piece = self.board.get_piece(row, col)
-        if piece != 0 and piece.color == self.turn:
-            self.selected = piece
-            self.valid_moves = self.board.get_valid_moves(piece)
-            return True
-            
-        return False
-
-    def _move(self, row, col):
-        piece = self.board.get_piece(row, col)
-        if self.selected and piece == 0 and (row, col) in self.valid_moves:
-            self.board.move(self.selected, row, col)
-            skipped = self.valid_moves[(row, col)]
-            if skipped:
-                self.board.remove(skipped)
-            
-            # Check for additional jumps
-            if skipped and self.board.get_valid_moves(self.selected).get((row, col), None):
-                return False  # Don't change turn, allow for multiple jumps
-            
-            self.change_turn()
-        else:
-            return False
-
-        return True
-
-    def draw_valid_moves(self, moves):
-        for move in moves:
-            row, col = move
-            pygame.draw.circle(self.win, BLUE, (col * SQUARE_SIZE + SQUARE_SIZE // 2, row * SQUARE_SIZE + SQUARE_SIZE // 2), 12)
-
-    def draw_turn_indicator(self):
-        turn_text = "Turn: Red" if self.turn == RED else "AI Thinking..."
-        color = RED if self.turn == RED else GREY
-        text = self.small_font.render(turn_text, 1, color)
-        self.win.blit(text, (WIDTH - text.get_width() - 10, 10))
-
-    def draw_thinking_text(self):
-        text = self.small_font.render("AI is thinking...", 1, GREY)
-        self.win.blit(text, (WIDTH//2 - text.get_width()//2, HEIGHT//2 - 60))
-
-    def change_turn(self):
-        self.valid_moves = {}
-        self.selected = None
-        if self.turn == RED:
-            self.turn = WHITE
-        else:
-            self.turn = RED
-
-        # Check for winner after each turn
-        winner = self.get_winner()
-        if winner:
-            self.game_over = True
-            self.winner = winner
-
-    def get_board(self):
-        return self.board
-
-    def ai_move(self, board):
-        self.board = board
-        self.change_turn()
-
-    def draw_game_over(self):
-        winner = self.board.winner()
-        if winner == RED:
-            text = "Red Player Wins!"
-            color = RED
-        elif winner == WHITE:
-            text = "White Player Wins!"
-            color = WHITE
-        else:
-            text = "Game Over: It's a Draw!"
-            color = GREY
-        
-        # Create a semi-transparent overlay
-        overlay = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
-        overlay.fill((0, 0, 0, 180))  # Black with 180 alpha (semi-transparent)
-        self.win.blit(overlay, (0, 0))
-        
-        # Render the game over text
-        font = pygame.font.SysFont('comicsans', 70)
-        text_surface = font.render(text, True, color)
-        text_rect = text_surface.get_rect(center=(WIDTH // 2, HEIGHT // 2))
-        self.win.blit(text_surface, text_rect)
-        
-        # Add a "Click to exit" message
-        small_font = pygame.font.SysFont('comicsans', 30)
-        exit_text = small_font.render("Click anywhere to exit", True, WHITE)
-        exit_rect = exit_text.get_rect(center=(WIDTH // 2, HEIGHT // 2 + 70))
-        self.win.blit(exit_text, exit_rect)
-        
-        pygame.display.update()
-        
-        # Wait for user click to exit
-        waiting = True
-        while waiting:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    waiting = False
-                    pygame.quit()
-                    sys.exit()
-                if event.type == pygame.MOUSEBUTTONDOWN:
-                    waiting = False
-                    pygame.quit()
-                    sys.exit()
-            pygame.time.delay(100)
-
-def minimax(position, depth, max_player, game, alpha=float('-inf'), beta=float('inf')):
-    if depth == 0 or position.winner() is not None:
-        return enhanced_evaluate(position), position
-
-    if max_player:
-        maxEval = float('-inf')
-        best_move = None
-        for move in get_all_moves(position, WHITE, game):
-            evaluation = minimax(move, depth-1, False, game, alpha, beta)[0]
-            maxEval = max(maxEval, evaluation)
-            alpha = max(alpha, evaluation)
-            if maxEval == evaluation:
-                best_move = move
-            if beta <= alpha:
-                break
-        return maxEval, best_move
-    else:
-        minEval = float('inf')
-        best_move = None
-        for move in get_all_moves(position, RED, game):
-            evaluation = minimax(move, depth-1, True, game, alpha, beta)[0]
-            minEval = min(minEval, evaluation)
-            beta = min(beta, evaluation)
-            if minEval == evaluation:
-                best_move = move
-            if beta <= alpha:
-                break
-        return minEval, best_move
-
-def enhanced_evaluate(board):
-    # Piece count evaluation
-    piece_score = (board.white_left - board.red_left) * 1.0
-    
-    # King evaluation (kings are more valuable)
-    king_score = (board.white_kings * 2.0 - board.red_kings * 2.0)  # Increased king value for 10x10
-    
-    # Positional evaluation
-    positional_score = 0
-    center_rows = range(3, 7)  # Center rows for 10x10 board
-    center_cols = range(3, 7)  # Center columns for 10x10 board
-    
-    for row in range(ROWS):
-        for col in range(COLS):
-            piece = board.board[row][col]
-            if piece != 0:
-                # Central control bonus (more important in 10x10)
-                distance_to_center = abs(col - COLS//2) + abs(row - ROWS//2)
-                center_bonus = (COLS//2 - distance_to_center) * 0.15  # Increased center bonus
-                
-                if piece.color == WHITE:
-                    positional_score += center_bonus
-                    # King mobility bonus
-                    if piece.king:
-                        positional_score += 0.8  # Kings are very valuable in 10x10
-                        # Bonus for being on opponent's side
-                        if row < ROWS//2:
-                            positional_score += 0.4
-                        # Extra bonus for central control
-                        if row in center_rows and col in center_cols:
-                            positional_score += 0.3
-                else:
-                    positional_score -= center_bonus
-                    if piece.king:
-                        positional_score -= 0.8
-                        if row > ROWS//2:
-                            positional_score -= 0.4
-                        if row in center_rows and col in center_cols:
-                            positional_score -= 0.3
-    
-    # Aggression bonus (pieces closer to promotion)
-    aggression_score = 0
-    white_pieces = board.get_all_pieces(WHITE)
-    red_pieces = board.get_all_pieces(RED)
-    
-    for piece in white_pieces:
-        if not piece.king:
-            aggression_score += (ROWS - 1 - piece.row) * 0.25  # More aggressive in 10x10
-    
-    for piece in red_pieces:
-        if not piece.king:
-            aggression_score -= piece.row * 0.25  # More aggressive in 10x10
-    
-    # Back row defense bonus (more important in 10x10)
-    back_row_score = 0
-    # Check white back row (row 0)
-    for col in range(COLS):
-        piece = board.board[0][col]
-        if piece != 0 and piece.color == WHITE and not piece.king:
-            back_row_score += 0.4  # Stronger defense bonus
-    
-    # Check red back row (row ROWS-1)
-    for col in range(COLS):
-        piece = board.board[ROWS-1][col]
-        if piece != 0 and piece.color == RED and not piece.king:
-            back_row_score -= 0.4
-    
-    # Mobility bonus (number of available moves - more important in 10x10)
-    mobility_score = 0
-    white_moves = len(board.all_valid_moves(WHITE))
-    red_moves = len(board.all_valid_moves(RED))
-    mobility_score = (white_moves - red_moves) * 0.15  # Increased mobility importance
-    
-    # King mobility bonus (separate from piece mobility)
-    king_mobility_score = 0
-    white_kings = board.get_all_pieces(WHITE)
-    red_kings = board.get_all_pieces(RED)
-    
-    for king in white_kings:
-        if king.king:
-            king_moves = len(board.get_valid_moves(king))
-            king_mobility_score += king_moves * 0.1
-    
-    for king in red_kings:
-        if king.king:
-            king_moves = len(board.get_valid_moves(king))
-            king_mobility_score -= king_moves * 0.1
-    
-    return (piece_score + king_score + positional_score + 
-            aggression_score + back_row_score + 
-            mobility_score + king_mobility_score)
-
-def simulate_move(piece, move, board, game, skip):
-    board.move(piece, move[0], move[1])
-    if skip:
-        board.remove(skip)
-    return board
-
-def get_all_moves(board, color, game):
-    moves = []
-
-    for piece in board.get_all_pieces(color):
-        valid_moves = board.get_valid_moves(piece)
-        for move, skip in valid_moves.items():
-            temp_board = deepcopy(board)
-            temp_piece = temp_board.get_piece(piece.row, piece.col)
-            new_board = simulate_move(temp_piece, move, temp_board, game, skip)
-            moves.append(new_board)
-    
-    return moves
-
-def main():
-    run = True
-    clock = pygame.time.Clock()
-    game = Game(WIN)
-
-    while run:
-        clock.tick(60)
-        
-        if game.game_over:
-            game.draw_game_over()  # This will handle the display and exit
-            
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                run = False
-            
-            if not game.game_over and event.type == pygame.MOUSEBUTTONDOWN:
-                if game.turn == RED:
-                    pos = pygame.mouse.get_pos()
-                    row, col = pos[1] // SQUARE_SIZE, pos[0] // SQUARE_SIZE
-                    
-                    if game.selected:
-                        result = game._move(row, col)
-                        if not result:
-                            game.select(row, col)
-                    else:
-                        game.select(row, col)
-
-        if not game.game_over and game.turn == WHITE:
-            current_time = pygame.time.get_ticks()
-            if current_time - game.last_move_time > game.move_delay:
-                game.ai_thinking = True
-                game.update()
-                
-                # AI move logic
-                best_move = None
-                max_depth = 3
-                total_pieces = game.board.red_left + game.board.white_left
-                if total_pieces < 15: max_depth = 4
-                elif total_pieces < 10: max_depth = 5
-                elif total_pieces < 6: max_depth = 6
-                
-                for depth in range(3, max_depth + 1):
-                    value, new_board = minimax(game.get_board(), depth, True, game)
-                    if new_board:
-                        best_move = new_board
-                
-                if best_move:
-                    game.ai_move(best_move)
-                    game.last_move_time = current_time
-                game.ai_thinking = False
-
-        game.update()
-    
-    pygame.quit()
-    sys.exit()
-
-if __name__ == "__main__":
-    main()
\ No newline at end of file
+import time
+STARTED = time.perf_counter()  # Taken before the other imports, for the startup timing
+
+import pygame
+import sys
+import math
+import os
+
+from checkers import (AI_TIME_MS, BIT_COL, BIT_ROW, BOOK_PATH, COLS, PONDER, RED, ROWS, SEARCH_WORKERS,
+                      SQUARE_BIT, TABLEBASE_PATH, TT_SIZE_MB, WHITE, BitBoard, SearchJob, SearchStats,
+                      TranspositionTable, bits, enhanced_evaluate, popcount, predict_reply)
+from checkers.book import OpeningBook
+from checkers.tablebase import Tablebase
+
+IMPORTED = time.perf_counter()
+
+# Constants
+WIDTH, HEIGHT = 680, 680
+SQUARE_SIZE = WIDTH // COLS
+HINT_RADIUS = 12
+ANIMATION_MS = 150  # Time for a moved piece to slide to its new square
+FRAME_MS = 16  # Redraw interval while something is animating
+AI_POLL_MS = 100  # How often the search progress text is refreshed
+LABEL_CACHE_SIZE = 256  # Rendered text surfaces kept before the cache is emptied
+STATS_LOG = None  # Path of a JSON lines file to append per-move search stats to, or None
+FONT_NAME = 'comic sans'
+FONT_CACHE_PATH = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'),
+                               'checkers-game', 'fonts')  # Delete to look the font up again
+STARTUP_LOG = 'startup_times.jsonl'  # Where --time-startup appends its measurements
+
+# Colors
+BLACK = (0, 0, 0)
+BLUE = (0, 0, 255)
+GREY = (128, 128, 128)
+CROWN = (255, 215, 0)  # Gold color for kings
+GREEN = (0, 255, 0)
+YELLOW = (255, 255, 0)
+PURPLE = (128, 0, 128)
+BROWN = (211, 84, 0)
+
+class FontCache:
+    """Fonts of one family, resolved once and built for each size on first use.
+
+    pygame.font.SysFont scans the system font database on every call, so the
+    resolved file is also remembered in FONT_CACHE_PATH between runs. If the
+    family is not installed the default font bundled with pygame is used.
+    """
+
+    def __init__(self, name, cache_path=FONT_CACHE_PATH):
+        self.name = name
+        self.cache_path = cache_path
+        self.hit = False  # Whether the path came from the cache file
+        self.path = self.resolve()
+        self.fonts = {}  # size -> pygame.font.Font
+
+    def resolve(self):
+        """Return the font file for self.name, or None for pygame's default font."""
+        cached = {}
+        try:
+            with open(self.cache_path) as lines:
+                for line in lines:
+                    name, _, path = line.rstrip('\n').partition('\t')
+                    cached[name] = path or None
+        except OSError:
+            pass
+        if self.name in cached and (cached[self.name] is None or os.path.exists(cached[self.name])):
+            self.hit = True
+            return cached[self.name]
+        path = cached[self.name] = pygame.font.match_font(self.name)
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            with open(self.cache_path, 'w') as out:
+                for name, font_path in cached.items():
+                    out.write('{}\t{}\n'.format(name, font_path or ''))
+        except OSError:
+            pass  # Read-only home: look the font up again next time
+        return path
+
+    def get(self, size):
+        font = self.fonts.get(size)
+        if font is None:
+            font = self.fonts[size] = pygame.font.Font(self.path, size)
+        return font
+
+
+def square_rect(row, col):
+    return pygame.Rect(col * SQUARE_SIZE, row * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE)
+
+
+class Piece:
+    PADDING = 12  # Slightly smaller padding for 10x10
+    OUTLINE = 2
+    _sprites = {}  # (color, king) -> pre-rendered SQUARE_SIZE surface
+
+    def __init__(self, row, col, color):
+        self.row = row
+        self.col = col
+        self.color = color
+        self.king = False
+        self.x = 0
+        self.y = 0
+        self.calc_pos()
+
+    def calc_pos(self):
+        self.x = SQUARE_SIZE * self.col + SQUARE_SIZE // 2
+        self.y = SQUARE_SIZE * self.row + SQUARE_SIZE // 2
+
+    def make_king(self):
+        self.king = True
+
+    @classmethod
+    def sprite(cls, color, king):
+        """Return the square-sized surface for a piece, rendering it on first use."""
+        sprite = cls._sprites.get((color, king))
+        if sprite is not None:
+            return sprite
+        sprite = pygame.Surface((SQUARE_SIZE, SQUARE_SIZE), pygame.SRCALPHA)
+        x = y = SQUARE_SIZE // 2
+        radius = SQUARE_SIZE // 2 - cls.PADDING
+        pygame.draw.circle(sprite, GREY, (x, y), radius + cls.OUTLINE)
+        pygame.draw.circle(sprite, color, (x, y), radius)
+        if king:
+            # Draw crown symbol for kings
+            pygame.draw.circle(sprite, CROWN, (x, y), radius // 1.8)
+            # Add star points to make crown more visible
+            for i in range(5):
+                angle = 2 * math.pi * i / 5 - math.pi / 2
+                outer_x = x + (radius // 2) * 0.8 * math.cos(angle)
+                outer_y = y + (radius // 2) * 0.8 * math.sin(angle)
+                inner_x = x + (radius // 3) * math.cos(angle + math.pi / 5)
+                inner_y = y + (radius // 3) * math.sin(angle + math.pi / 5)
+                pygame.draw.polygon(sprite, CROWN, [
+                    (x, y),
+                    (outer_x, outer_y),
+                    (inner_x, inner_y)
+                ])
+        cls._sprites[(color, king)] = sprite
+        return sprite
+
+    def draw(self, win):
+        win.blit(self.sprite(self.color, self.king), (self.x - SQUARE_SIZE // 2, self.y - SQUARE_SIZE // 2))
+
+    def move(self, row, col):
+        self.row = row
+        self.col = col
+        self.calc_pos()
+
+    def __repr__(self):
+        return str(self.color)
+
+class Board:
+    """Pygame-facing view of a BitBoard.
+
+    The engine works on self.bits; the grid of Piece objects only exists so
+    the GUI can select, move and draw individual pieces.
+    """
+
+    _background = None  # The empty board, rendered once
+
+    def __init__(self, position=None):
+        """Set up the start position, or a copy of position (a BitBoard, e.g. from checkers.from_fen)."""
+        self.board = []
+        self.bits = position.copy() if position is not None else BitBoard.initial()
+        self.create_board()
+
+    @property
+    def red_left(self):
+        return popcount(self.bits.red)
+
+    @property
+    def white_left(self):
+        return popcount(self.bits.white)
+
+    @property
+    def red_kings(self):
+        return popcount(self.bits.red & self.bits.kings)
+
+    @property
+    def white_kings(self):
+        return popcount(self.bits.white & self.bits.kings)
+
+    @classmethod
+    def background(cls):
+        if cls._background is None:
+            cls._background = pygame.Surface((WIDTH, HEIGHT))
+            cls._background.fill(BLACK)
+            for row in range(ROWS):
+                for col in range(row % 2, ROWS, 2):
+                    pygame.draw.rect(cls._background, WHITE, (row * SQUARE_SIZE, col * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE))
+        return cls._background
+
+    def draw_squares(self, win):
+        win.blit(self.background(), (0, 0))
+
+    def evaluate(self):
+        return enhanced_evaluate(self.bits)
+
+    def get_all_pieces(self, color):
+        pieces = []
+        for bit in bits(self.bits.pieces(color)):
+            pieces.append(self.board[BIT_ROW[bit]][BIT_COL[bit]])
+        return pieces
+
+    def move(self, piece, row, col):
+        self.board[piece.row][piece.col], self.board[row][col] = self.board[row][col], self.board[piece.row][piece.col]
+        promoted = self.bits.move_piece(SQUARE_BIT[piece.row][piece.col], SQUARE_BIT[row][col])
+        piece.move(row, col)
+
+        if promoted:
+            piece.make_king()
+
+    def get_piece(self, row, col):
+        return self.board[row][col]
+
+    def create_board(self):
+        for row in range(ROWS):
+            self.board.append([])
+            for col in range(COLS):
+                bit = SQUARE_BIT[row][col]
+                color = self.bits.color_at(bit) if bit >= 0 else None
+                if color is not None:
+                    self.board[row].append(Piece(row, col, color))
+                else:
+                    self.board[row].append(0)
+
+    def draw(self, win):
+        self.draw_squares(win)
+        for row in range(ROWS):
+            for col in range(COLS):
+                piece = self.board[row][col]
+                if piece != 0:
+                    piece.draw(win)
+
+    def remove(self, pieces):
+        mask = 0
+        for piece in pieces:
+            if piece != 0:
+                self.board[piece.row][piece.col] = 0
+                mask |= 1 << SQUARE_BIT[piece.row][piece.col]
+        self.bits.remove(mask)
+
+    def winner(self, turn=None):
+        return self.bits.winner(turn)
+
+    def apply_move(self, move):
+        """Play an engine move (from, to, captured mask) on the board."""
+        frm, to, caps = move
+        piece = self.get_piece(BIT_ROW[frm], BIT_COL[frm])
+        skipped = [self.get_piece(BIT_ROW[bit], BIT_COL[bit]) for bit in bits(caps)]
+        self.move(piece, BIT_ROW[to], BIT_COL[to])
+        if skipped:
+            self.remove(skipped)
+
+    def all_valid_moves(self, color):
+        moves = {}
+        for piece in self.get_all_pieces(color):
+            valid_moves = self.get_valid_moves(piece)
+            if valid_moves:
+                moves[piece] = valid_moves
+        return moves
+
+    def get_valid_moves(self, piece):
+        moves = {}
+        for to, caps in self.bits.piece_moves(SQUARE_BIT[piece.row][piece.col]).items():
+            moves[(BIT_ROW[to], BIT_COL[to])] = [self.board[BIT_ROW[bit]][BIT_COL[bit]] for bit in bits(caps)]
+        return moves
+
+class Game:
+    def __init__(self, win):
+        self._init()
+        self.win = win
+        self.fonts = FontCache(FONT_NAME)
+        self.overlay = None  # Semi-transparent game over shade, created on first use
+        self.labels = {}  # (font, text, color) -> rendered surface
+        self.frame = None  # What is on screen: (pieces, hints, labels) of the last update
+        self.searcher = None  # ParallelSearch, created on first use when SEARCH_WORKERS > 1
+        self.tablebase = Tablebase.open(TABLEBASE_PATH)  # None until one has been generated
+        self.book = OpeningBook.open(BOOK_PATH)
+        self.pondering = PONDER  # Toggled with the P key
+        self.show_stats = False  # Toggled with the S key
+        self.last_stats = None
+        self.ai_thinking = False
+        self.last_move_time = 0
+        self.move_delay = 500  # milliseconds
+
+    # Fonts are only built when first drawn with
+    @property
+    def font(self):
+        return self.fonts.get(70)
+
+    @property
+    def small_font(self):
+        return self.fonts.get(40)
+
+    @property
+    def medium_font(self):
+        return self.fonts.get(50)
+
+    @property
+    def stats_font(self):
+        return self.fonts.get(24)
+
+    @property
+    def exit_font(self):
+        return self.fonts.get(30)
+
+    def update(self):
+        """Redraw and flip only the parts of the window that changed since the last call."""
+        pieces = {}
+        for row in range(ROWS):
+            for col in range(COLS):
+                piece = self.board.board[row][col]
+                if piece != 0:
+                    pieces[(row, col)] = (piece.color, piece.king)
+        hints = set(self.valid_moves)
+        labels = self.animation_labels(pieces) + self.turn_indicator_labels()
+        if self.ai_thinking:
+            labels += self.thinking_labels()
+        if self.show_stats:
+            labels += self.stats_labels()
+        if self.game_over:
+            labels += self.game_over_labels()
+
+        if self.frame is None:
+            dirty = [pygame.Rect(0, 0, WIDTH, HEIGHT)]
+        else:
+            old_pieces, old_hints, old_labels = self.frame
+            changed = {square for square in pieces.keys() | old_pieces.keys()
+                       if pieces.get(square) != old_pieces.get(square)}
+            changed |= hints ^ old_hints
+            dirty = [square_rect(row, col) for row, col in changed]
+            dirty += [pygame.Rect(rect) for label, rect in set(labels) ^ set(old_labels)]
+        self.frame = (pieces, hints, labels)
+
+        for rect in dirty:
+            self.redraw(rect, pieces, hints, labels)
+        if dirty:
+            pygame.display.update(dirty)
+
+    def timeout(self):
+        """Milliseconds the main loop may sleep waiting for events; 0 means until one arrives."""
+        if self.animation is not None:
+            return FRAME_MS
+        if self.ai_job is not None:
+            return AI_POLL_MS
+        if not self.game_over and self.turn == WHITE:
+            return max(1, self.move_delay - (pygame.time.get_ticks() - self.last_move_time))
+        return 0
+
+    def tick(self):
+        """Advance animations and the AI; called once per pass of the main loop."""
+        if self.animation is not None and pygame.time.get_ticks() - self.animation[4] >= ANIMATION_MS:
+            self.animation = None
+        if self.game_over:
+            return
+        if self.turn != WHITE:
+            if self.pondering and self.ponder_job is None and self.ai_job is None:
+                self.start_ponder()
+            return
+        if self.ai_job is not None:
+            self.poll_ai()
+        elif self.animation is None and pygame.time.get_ticks() - self.last_move_time > self.move_delay:
+            self.start_ai()
+
+    def animate(self, row, col, to_row, to_col):
+        """Slide the piece that just moved to (to_row, to_col) in from (row, col)."""
+        self.animation = (to_row, to_col, col * SQUARE_SIZE, row * SQUARE_SIZE, pygame.time.get_ticks())
+
+    def redraw(self, rect, pieces, hints, labels):
+        """Repaint rect from the cached background, piece sprites and labels."""
+        self.win.set_clip(rect)
+        self.win.blit(Board.background(), rect, rect)
+        for row in range(max(rect.top // SQUARE_SIZE, 0), min((rect.bottom - 1) // SQUARE_SIZE + 1, ROWS)):
+            for col in range(max(rect.left // SQUARE_SIZE, 0), min((rect.right - 1) // SQUARE_SIZE + 1, COLS)):
+                x, y = col * SQUARE_SIZE, row * SQUARE_SIZE
+                if (row, col) in pieces:
+                    self.win.blit(Piece.sprite(*pieces[(row, col)]), (x, y))
+                if (row, col) in hints:
+                    pygame.draw.circle(self.win, BLUE, (x + SQUARE_SIZE // 2, y + SQUARE_SIZE // 2), HINT_RADIUS)
+        for label, label_rect in labels:
+            if rect.colliderect(label_rect):
+                self.win.blit(label, label_rect[:2])
+        self.win.set_clip(None)
+
+    def label(self, font, text, color):
+        """Render text once and reuse the surface while it stays the same."""
+        key = (font, text, color)
+        surface = self.labels.get(key)
+        if surface is None:
+            if len(self.labels) >= LABEL_CACHE_SIZE:
+                self.labels.clear()  # Progress text changes every frame while the AI thinks
+            surface = self.labels[key] = font.render(text, 1, color)
+        return surface
+
+
+    def _init(self):
+        self.selected = None
+        self.board = Board()
+        self.turn = RED
+        self.valid_moves = {}
+        self.game_over = False
+        self.winner = None
+        self.ai_thinking = False
+        self.ai_job = None
+        self.ai_progress = None
+        self.ponder_job = None  # Search of the position after RED's predicted reply
+        self.ponder_key = None  # Key of that position with WHITE to move
+        self.animation = None  # (row, col, from_x, from_y, start ticks) of a piece sliding into place
+        self.tt = TranspositionTable(TT_SIZE_MB)
+
+    def get_winner(self):
+        return self.board.winner(self.turn)
+
+    def reset(self):
+        self.cancel_ai()
+        self._init()
+
+    def select(self, row, col):
+        if self.selected:
+            result = self._move(row, col)
+            if not result:
+                self.selected = None
+                self.select(row, col)
+        
+        piece = self.board.get_piece(row, col)
+        if piece != 0 and piece.color == self.turn:
+            self.selected = piece
+            self.valid_moves = self.board.get_valid_moves(piece)
+            return True
+            
+        return False
+
+    def _move(self, row, col):
+        piece = self.board.get_piece(row, col)
+        if self.selected and piece == 0 and (row, col) in self.valid_moves:
+            self.animate(self.selected.row, self.selected.col, row, col)
+            self.board.move(self.selected, row, col)
+            skipped = self.valid_moves[(row, col)]
+            if skipped:
+                self.board.remove(skipped)
+            
+            # Check for additional jumps
+            if skipped and self.board.get_valid_moves(self.selected).get((row, col), None):
+                return False  # Don't change turn, allow for multiple jumps
+            
+            self.change_turn()
+        else:
+            return False
+
+        return True
+
+    # The *_labels methods return [(surface, (x, y, width, height)), ...] to draw over the board
+
+    def animation_labels(self, pieces):
+        """Draw the moving piece between squares; it is hidden from pieces until it lands."""
+        if self.animation is None:
+            return []
+        row, col, from_x, from_y, start = self.animation
+        if (row, col) not in pieces:
+            return []
+        sprite = Piece.sprite(*pieces.pop((row, col)))
+        t = min(1.0, (pygame.time.get_ticks() - start) / ANIMATION_MS)
+        x = round(from_x + (col * SQUARE_SIZE - from_x) * t)
+        y = round(from_y + (row * SQUARE_SIZE - from_y) * t)
+        return [(sprite, (x, y, SQUARE_SIZE, SQUARE_SIZE))]
+
+    def turn_indicator_labels(self):
+        turn_text = "Turn: Red" if self.turn == RED else "AI Thinking..."
+        color = RED if self.turn == RED else GREY
+        text = self.label(self.small_font, turn_text, color)
+        return [(text, (WIDTH - text.get_width() - 10, 10, text.get_width(), text.get_height()))]
+
+    def thinking_labels(self):
+        text = self.label(self.small_font, "AI is thinking...", GREY)
+        labels = [(text, (WIDTH//2 - text.get_width()//2, HEIGHT//2 - 60, text.get_width(), text.get_height()))]
+        if self.ai_progress:
+            stats = "depth {}  nodes {}  {:.0f} ms".format(
+                self.ai_progress['depth'], self.ai_progress['nodes'], self.ai_progress['elapsed_ms'])
+            text = self.label(self.stats_font, stats, GREY)
+            labels.append((text, (WIDTH//2 - text.get_width()//2, HEIGHT//2 - 15, text.get_width(), text.get_height())))
+        return labels
+
+    def stats_labels(self):
+        stats = self.ai_job.state.stats if self.ai_job is not None else self.last_stats
+        if stats is None:
+            return []
+        labels = []
+        for i, line in enumerate(stats.overlay_lines()):
+            text = self.label(self.stats_font, line, YELLOW)
+            y = 10 + i * (text.get_height() + 2)
+            labels.append((text, (10, y, text.get_width(), text.get_height())))
+        return labels
+
+    def change_turn(self):
+        self.valid_moves = {}
+        self.selected = None
+        if self.turn == RED:
+            self.turn = WHITE
+        else:
+            self.turn = RED
+
+        # Check for winner after each turn
+        winner = self.get_winner()
+        if winner:
+            self.game_over = True
+            self.winner = winner
+            self.cancel_ponder()
+
+    def get_board(self):
+        return self.board
+
+    def ai_move(self, move):
+        frm, to = move[0], move[1]
+        self.animate(BIT_ROW[frm], BIT_COL[frm], BIT_ROW[to], BIT_COL[to])
+        self.board.apply_move(move)
+        self.change_turn()
+
+    def start_ai(self):
+        """Start searching for WHITE's move without blocking the event loop.
+
+        Positions in the opening book are answered at once with a book move.
+        """
+        if self.ponder_job is not None:
+            job, key = self.ponder_job, self.ponder_key
+            self.ponder_job = self.ponder_key = None
+            if key == self.board.bits.key(WHITE):
+                # RED played the predicted move: keep the search that is already running
+                self.ai_job = job.ponderhit(AI_TIME_MS)
+                self.ai_progress = self.ai_job.poll()
+                self.ai_thinking = True
+                return
+            job.cancel()
+        move = self.book.choose(self.board.bits, WHITE) if self.book is not None else None
+        if move is not None:
+            self.ai_move(move)
+            self.last_move_time = pygame.time.get_ticks()
+            return
+        if SEARCH_WORKERS > 1 and self.searcher is None:
+            from checkers.parallel import ParallelSearch  # multiprocessing is slow to import; load it on demand
+            self.searcher = ParallelSearch(SEARCH_WORKERS, TT_SIZE_MB)
+        stats = SearchStats() if self.show_stats or STATS_LOG else None
+        self.ai_job = SearchJob(self.board.bits, True, AI_TIME_MS, self.tt, self.searcher, stats,
+                                self.tablebase).start()
+        self.ai_progress = self.ai_job.poll()
+        self.ai_thinking = True
+
+    def poll_ai(self):
+        """Update the search progress; play the move once the search is done."""
+        if self.ai_job is None:
+            return False
+        self.ai_progress = self.ai_job.poll()
+        if not self.ai_progress['done']:
+            return False
+        stats = self.ai_job.state.stats
+        if stats is not None:
+            self.last_stats = stats
+            if STATS_LOG:
+                stats.write_jsonl(STATS_LOG, depth=self.ai_progress['depth'], score=self.ai_progress['score'])
+        self.ai_job = None
+        self.ai_thinking = False
+        if self.ai_progress['move']:
+            self.ai_move(self.ai_progress['move'])
+            self.last_move_time = pygame.time.get_ticks()
+        return True
+
+    def cancel_ai(self):
+        if self.ai_job is not None:
+            self.ai_job.cancel()
+            self.ai_job = None
+        self.ai_thinking = False
+        self.cancel_ponder()
+
+    def start_ponder(self):
+        """Search WHITE's answer to RED's most likely move while RED thinks.
+
+        The job shares the transposition table with the real search, so even
+        a wrong guess leaves useful entries behind.
+        """
+        reply = predict_reply(self.board.bits, RED, self.tt)
+        if reply is None:
+            return
+        position = self.board.bits.copy()
+        position.make_move(reply)
+        self.ponder_key = position.key(WHITE)
+        self.ponder_job = SearchJob(position, True, None, self.tt, tablebase=self.tablebase).start()
+
+    def cancel_ponder(self):
+        if self.ponder_job is not None:
+            self.ponder_job.cancel()
+            self.ponder_job = self.ponder_key = None
+
+    def game_over_labels(self):
+        winner = self.winner
+        if winner == RED:
+            text = "Red Player Wins!"
+            color = RED
+        elif winner == WHITE:
+            text = "White Player Wins!"
+            color = WHITE
+        else:
+            text = "Game Over: It's a Draw!"
+            color = GREY
+
+        # Semi-transparent shade over the board
+        if self.overlay is None:
+            self.overlay = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
+            self.overlay.fill((0, 0, 0, 180))  # Black with 180 alpha (semi-transparent)
+        labels = [(self.overlay, (0, 0, WIDTH, HEIGHT))]
+
+        # The game over text and a "Click to exit" message below it
+        for font, line, line_color, y in ((self.font, text, color, HEIGHT // 2),
+                                          (self.exit_font, "Click anywhere to exit", WHITE, HEIGHT // 2 + 70)):
+            surface = self.label(font, line, line_color)
+            width, height = surface.get_width(), surface.get_height()
+            labels.append((surface, (WIDTH // 2 - width // 2, y - height // 2, width, height)))
+        return labels
+
+def time_startup(runs=5, log=STARTUP_LOG):
+    """Start the game runs times up to its first frame and record the timings.
+
+    Each run is a fresh interpreter, so module imports are included. The
+    median of each phase (seconds since the first import of this module) is
+    printed and appended to log as one JSON line.
+    """
+    import json
+    import statistics
+    import subprocess
+    import tempfile
+
+    records = []
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as temp:
+            path = os.path.join(temp, 'startup.json')
+            subprocess.run([sys.executable, os.path.abspath(__file__), '--first-frame', path], check=True)
+            with open(path) as result:
+                records.append(json.load(result))
+    summary = {'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'runs': runs,
+               'font_cache_hits': sum(record.pop('font_cache_hit') for record in records)}
+    for phase in records[0]:
+        summary[phase] = statistics.median(record[phase] for record in records)
+        print("{:12s} {:8.1f} ms".format(phase, summary[phase] * 1000))
+    if log:
+        with open(log, 'a') as out:
+            out.write(json.dumps(summary) + '\n')
+    return summary
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ['--time-startup']:
+        time_startup(int(argv[1]) if len(argv) > 1 else 5)
+        return
+    first_frame = argv[1] if argv[:1] == ['--first-frame'] else None  # Used by time_startup
+
+    # Initialize pygame and set up the display only when the GUI is launched
+    pygame.init()
+    initialized = time.perf_counter()
+    win = pygame.display.set_mode((WIDTH, HEIGHT))
+    pygame.display.set_caption('Checker Game')
+    window = time.perf_counter()
+
+    run = True
+    game = Game(win)
+    created = time.perf_counter()
+
+    while run:
+        # Draw whatever changed, then sleep until an event arrives or the
+        # game needs to animate, poll the AI or start its move
+        game.update()
+        if first_frame:
+            import json
+            shown = time.perf_counter()
+            with open(first_frame, 'w') as out:
+                json.dump({'import': IMPORTED - STARTED, 'init': initialized - STARTED, 'window': window - STARTED,
+                           'game': created - STARTED, 'first_frame': shown - STARTED,
+                           'font_cache_hit': game.fonts.hit}, out)
+            break
+        timeout = game.timeout()
+        first = pygame.event.wait(timeout) if timeout else pygame.event.wait()
+
+        for event in [first] + pygame.event.get():
+            if event.type == pygame.QUIT:
+                game.cancel_ai()
+                run = False
+
+            elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                game.frame = None  # Window was uncovered: repaint all of it
+
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_s:
+                game.show_stats = not game.show_stats
+
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_p:
+                game.pondering = not game.pondering
+                if not game.pondering:
+                    game.cancel_ponder()
+
+            elif event.type == pygame.MOUSEBUTTONDOWN:
+                if game.game_over:
+                    run = False  # "Click anywhere to exit"
+                elif game.turn == RED:
+                    row, col = event.pos[1] // SQUARE_SIZE, event.pos[0] // SQUARE_SIZE
+
+                    if game.selected:
+                        result = game._move(row, col)
+                        if not result:
+                            game.select(row, col)
+                    else:
+                        game.select(row, col)
+
+        # AI move logic: the search runs in a background thread so the
+        # window keeps repainting and handling events meanwhile
+        game.tick()
+
+    if game.searcher is not None:
+        game.searcher.close()
+    if game.tablebase is not None:
+        game.tablebase.close()
+    if game.book is not None:
+        game.book.close()
+    pygame.quit()
+    sys.exit()
+
+if __name__ == "__main__":
+    main()
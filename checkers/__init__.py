@@ -0,0 +1,19 @@
+"""Headless 10x10 checkers engine: rules, evaluation and search.
+
+Nothing in this package imports pygame, so it can be used from batch jobs,
+worker processes and tools; the pygame front end lives in ai_project.py.
+The multi-process search is not imported here because multiprocessing is
+slow to import; use ``from checkers.parallel import ParallelSearch``. The
+same goes for NumPy batch evaluation in ``checkers.batch``.
+"""
+
+from .bitboard import BitBoard, zobrist_hash
+from .constants import (AI_TIME_MS, BOOK_PATH, COLS, MAX_SEARCH_DEPTH, PONDER, RED, ROWS, SEARCH_WORKERS,
+                        TABLEBASE_PATH, TT_SIZE_MB, WHITE, WIN_SCORE, WIN_THRESHOLD)
+from .evaluation import EVAL_WEIGHTS, enhanced_evaluate, evaluate_full, use_weights, verify_evaluation
+from .layout import BIT_COL, BIT_ROW, SQUARE_BIT, bits, popcount
+from .notation import from_fen, pack_position, to_fen, unpack_position
+from .search import (SearchJob, SearchState, SearchTimeout, get_all_moves, iterative_deepening,
+                     minimax, predict_reply)
+from .stats import SearchStats
+from .tt import EXACT, LOWER, UPPER, TranspositionTable
@@ -0,0 +1,215 @@
+"""Batch evaluation of many positions at once with NumPy.
+
+NumPy is optional: without it evaluate_batch falls back to calling
+enhanced_evaluate per position. Positions are unpacked to one uint8 plane
+per piece kind over the 50 squares; material and piece-square terms are a
+single matrix product with the piece-square tables, and mobility is counted
+with neighbour index arrays. Results equal enhanced_evaluate exactly.
+
+extract_features() splits the same evaluation into one column per weight
+in EVAL_WEIGHTS (TERMS), so that features @ weights is the evaluation; the
+tuner fits weights to those columns.
+
+``python -m checkers.batch`` checks that equality on random games and times
+both paths for a few batch sizes.
+"""
+
+import argparse
+import random
+import sys
+import time
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - NumPy is an optional dependency
+    np = None
+
+from . import evaluation
+from .bitboard import BitBoard
+from .constants import RED, WHITE, WIN_SCORE
+from .layout import BIT_ROW, DOWN_DIRECTIONS, STEP, UP_DIRECTIONS
+
+HAVE_NUMPY = np is not None
+TERMS = tuple(evaluation.EVAL_WEIGHTS)  # Column order of extract_features
+SQUARES = sorted(BIT_ROW)
+PAD = len(SQUARES)  # Column index of the always-empty, never-occupied off-board square
+_weights = {}  # ids of the piece-square tables and the weights -> weight vector
+_term_columns = []  # Cached _term_matrix()
+
+if HAVE_NUMPY:
+    _SQUARE_COLUMNS = np.array(SQUARES)
+    _column = {bit: i for i, bit in enumerate(SQUARES)}
+    # NEIGHBOUR[d][i]: column one step from column i in direction d; JUMP[d][i]: two steps
+    NEIGHBOUR = {d: np.array([_column.get(STEP[d][bit], PAD) for bit in SQUARES] + [PAD])
+                 for d in UP_DIRECTIONS + DOWN_DIRECTIONS}
+    JUMP = {d: NEIGHBOUR[d][NEIGHBOUR[d]] for d in NEIGHBOUR}
+    del _column
+
+
+def _weight_matrix():
+    """Piece-square tables as one (4 * 50,) vector, rebuilt if the tables or the weights changed."""
+    tables = (evaluation.PST_RED, evaluation.PST_RED_KING, evaluation.PST_WHITE, evaluation.PST_WHITE_KING)
+    key = tuple(map(id, tables)) + tuple(evaluation.EVAL_WEIGHTS.values())
+    if key not in _weights:
+        _weights.clear()
+        _weights[key] = np.array([table[bit] for table in tables for bit in SQUARES], dtype=np.int64)
+    return _weights[key]
+
+
+def _term_matrix():
+    """(4 * 50, len(TERMS)) matrix: what one unit of each weight is worth per piece kind and square."""
+    if not _term_columns:
+        for term in TERMS:
+            unit = dict.fromkeys(TERMS, 0)
+            unit[term] = 1
+            tables = evaluation.build_piece_square_tables(unit)
+            _term_columns.append([table[bit] for table in tables for bit in SQUARES])
+    return np.array(_term_columns, dtype=np.int64).T
+
+
+def encode_positions(positions):
+    """Unpack positions (BitBoards or (red, white, kings)) to four (N, 50) uint8 planes.
+
+    Returns (red men, red kings, white men, white kings).
+    """
+    masks = np.array([(p.red, p.white, p.kings) if hasattr(p, 'red') else p for p in positions],
+                     dtype=np.uint64).reshape(-1, 3)
+    unpacked = np.unpackbits(masks.view(np.uint8).reshape(-1, 3, 8), axis=2, bitorder='little')
+    planes = unpacked[:, :, _SQUARE_COLUMNS]
+    red, white, kings = planes[:, 0], planes[:, 1], planes[:, 2]
+    return red & ~kings & 1, red & kings, white & ~kings & 1, white & kings
+
+
+def _padded(plane):
+    return np.concatenate([plane, np.zeros((plane.shape[0], 1), dtype=plane.dtype)], axis=1)
+
+
+def _mobility(own, opp, up, down, kings):
+    """Vectorised BitBoard.mobility: (pieces that can move, king destinations) per row."""
+    empty = _padded(1 - own - opp)
+    opp = _padded(opp)
+    movable = np.zeros_like(own)
+    for movers, directions in ((up, UP_DIRECTIONS), (down, DOWN_DIRECTIONS)):
+        for d in directions:
+            free = empty[:, NEIGHBOUR[d][:PAD]] | (opp[:, NEIGHBOUR[d][:PAD]] & empty[:, JUMP[d][:PAD]])
+            movable |= movers & free
+    pieces = movable.sum(axis=1, dtype=np.int64)
+
+    king_moves = np.zeros(own.shape[0], dtype=np.int64)
+    for d in UP_DIRECTIONS + DOWN_DIRECTIONS:
+        king_moves += (kings & empty[:, NEIGHBOUR[d][:PAD]]).sum(axis=1, dtype=np.int64)
+    # Jump landings are counted per king, like the destination dict of
+    # piece_moves, so expand to one row per king and walk the jump chains
+    rows, columns = np.nonzero(kings)
+    if len(rows):
+        start = np.zeros((len(rows), PAD + 1), dtype=np.uint8)
+        start[np.arange(len(rows)), columns] = 1
+        king_empty, king_opp = empty[rows], opp[rows]
+        landed = np.zeros((len(rows), PAD), dtype=np.uint8)
+        for directions in (UP_DIRECTIONS, DOWN_DIRECTIONS):
+            frontier = start
+            while frontier.any():
+                reached = np.zeros((len(rows), PAD), dtype=np.uint8)
+                for d in directions:
+                    back = -d  # A landing square is reached from two steps back
+                    reached |= (frontier[:, JUMP[back][:PAD]] & king_opp[:, NEIGHBOUR[back][:PAD]] &
+                                king_empty[:, :PAD])
+                landed |= reached
+                frontier = _padded(reached)
+        king_moves += np.bincount(rows, weights=landed.sum(axis=1), minlength=own.shape[0]).astype(np.int64)
+    return pieces, king_moves
+
+
+def evaluate_batch(positions, to_move=None, ply=0):
+    """Return enhanced_evaluate(bb, to_move, ply) for every position, as a list of ints."""
+    if not HAVE_NUMPY or not positions:
+        return [evaluation.enhanced_evaluate(p if hasattr(p, 'red') else BitBoard(*p), to_move, ply)
+                for p in positions]
+    red_men, red_kings, white_men, white_kings = encode_positions(positions)
+    planes = np.concatenate([red_men, red_kings, white_men, white_kings], axis=1).astype(np.int64)
+    score = planes @ _weight_matrix()
+
+    red, white = red_men | red_kings, white_men | white_kings
+    white_moves, white_king_moves = _mobility(white, red, white_kings, white, white_kings)
+    red_moves, red_king_moves = _mobility(red, white, red, red_kings, red_kings)
+    weights = evaluation.EVAL_WEIGHTS
+    score += (white_moves - red_moves) * weights['mobility']
+    score += (white_king_moves - red_king_moves) * weights['king_mobility']
+    if to_move == WHITE:
+        score = np.where(white_moves == 0, ply - WIN_SCORE, score)
+    elif to_move == RED:
+        score = np.where(red_moves == 0, WIN_SCORE - ply, score)
+    return score.tolist()
+
+
+def extract_features(positions):
+    """Return an (N, len(TERMS)) int64 matrix with features @ weights == evaluate_batch(positions).
+
+    Columns are WHITE minus RED counts per term, e.g. kings for 'king' and
+    movable pieces for 'mobility'. Needs NumPy.
+    """
+    red_men, red_kings, white_men, white_kings = encode_positions(positions)
+    planes = np.concatenate([red_men, red_kings, white_men, white_kings], axis=1).astype(np.int64)
+    features = planes @ _term_matrix()
+    red, white = red_men | red_kings, white_men | white_kings
+    white_moves, white_king_moves = _mobility(white, red, white_kings, white, white_kings)
+    red_moves, red_king_moves = _mobility(red, white, red, red_kings, red_kings)
+    features[:, TERMS.index('mobility')] = white_moves - red_moves
+    features[:, TERMS.index('king_mobility')] = white_king_moves - red_king_moves
+    return features
+
+
+def random_positions(count, seed=0, plies=150):
+    """Positions from random games, for checks and benchmarks."""
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        bb = BitBoard.initial()
+        color = RED
+        for _ in range(plies):
+            moves = bb.generate_moves(color)
+            if not moves:
+                break
+            bb.make_move(rng.choice(moves))
+            positions.append((bb.copy(), color))
+            color = WHITE if color == RED else RED
+    return positions[:count]
+
+
+def verify_batch(count=20000, seed=0):
+    """Assert evaluate_batch equals enhanced_evaluate on random positions; return the count."""
+    positions = random_positions(count, seed)
+    for to_move in (None, RED, WHITE):
+        boards = [bb for bb, _ in positions]
+        expected = [evaluation.enhanced_evaluate(bb, to_move, 3) for bb in boards]
+        got = evaluate_batch(boards, to_move, 3)
+        for bb, want, have in zip(boards, expected, got):
+            assert want == have, (bb.red, bb.white, bb.kings, to_move, want, have)
+    return len(positions)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check and time batch evaluation.")
+    parser.add_argument('--positions', type=int, default=20000)
+    args = parser.parse_args(argv)
+    if not HAVE_NUMPY:
+        print("NumPy is not installed; evaluate_batch uses the scalar evaluation")
+        return 1
+    print("checked {} positions".format(verify_batch(args.positions)))
+    boards = [bb for bb, _ in random_positions(args.positions, seed=1)]
+    start = time.perf_counter()
+    for bb in boards:
+        evaluation.enhanced_evaluate(bb)
+    scalar = len(boards) / (time.perf_counter() - start)
+    print("scalar       {:10.0f} positions/s".format(scalar))
+    for size in (8, 32, 256, 4096):
+        start = time.perf_counter()
+        for i in range(0, len(boards), size):
+            evaluate_batch(boards[i:i + size])
+        rate = len(boards) / (time.perf_counter() - start)
+        print("batch {:5d}  {:10.0f} positions/s  ({:.1f}x)".format(size, rate, rate / scalar))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,300 @@
+"""BitBoard: the engine's position, move generator and make/unmake."""
+
+import random
+
+from .constants import RED, WHITE
+from .evaluation import PST_RED, PST_RED_KING, PST_WHITE, PST_WHITE_KING, enhanced_evaluate, material_score
+from .layout import (BOARD_MASK, BOTTOM_ROW_MASK, BIT_ROW, DOWN_DIRECTIONS, KEY_SLOTS, STEP,
+                     TOP_ROW_MASK, UP_DIRECTIONS, bits, popcount, shift)
+
+
+# Zobrist keys: one random 64-bit number per (piece kind, square) plus one
+# for the side to move. Seeded so hashes are stable between runs.
+_zobrist_rng = random.Random(20250511)
+ZOBRIST_RED = [_zobrist_rng.getrandbits(64) for _ in range(KEY_SLOTS)]
+ZOBRIST_RED_KING = [_zobrist_rng.getrandbits(64) for _ in range(KEY_SLOTS)]
+ZOBRIST_WHITE = [_zobrist_rng.getrandbits(64) for _ in range(KEY_SLOTS)]
+ZOBRIST_WHITE_KING = [_zobrist_rng.getrandbits(64) for _ in range(KEY_SLOTS)]
+ZOBRIST_SIDE = _zobrist_rng.getrandbits(64)  # XORed in when WHITE is to move
+
+
+def zobrist_hash(red, white, kings):
+    h = 0
+    for bit in bits(red):
+        h ^= ZOBRIST_RED_KING[bit] if (kings >> bit) & 1 else ZOBRIST_RED[bit]
+    for bit in bits(white):
+        h ^= ZOBRIST_WHITE_KING[bit] if (kings >> bit) & 1 else ZOBRIST_WHITE[bit]
+    return h
+
+
+class BitBoard:
+    """Piece placement as three masks: red pieces, white pieces and kings.
+
+    hash (Zobrist key) and score (material and piece-square terms of the
+    evaluation) are kept up to date incrementally as pieces move.
+    """
+
+    def __init__(self, red=0, white=0, kings=0):
+        self.red = red
+        self.white = white
+        self.kings = kings
+        self.hash = zobrist_hash(red, white, kings)
+        self.score = material_score(red, white, kings)
+
+    @classmethod
+    def initial(cls):
+        red = white = 0
+        for bit, row in BIT_ROW.items():
+            if row < 4:
+                white |= 1 << bit
+            elif row > 5:
+                red |= 1 << bit
+        return cls(red, white, 0)
+
+    def copy(self):
+        return BitBoard(self.red, self.white, self.kings)
+
+    def key(self, color):
+        """Zobrist key of this position with color to move."""
+        return self.hash ^ ZOBRIST_SIDE if color == WHITE else self.hash
+
+    def evaluate(self, to_move=None, ply=0):
+        """Leaf score from WHITE's point of view; see enhanced_evaluate."""
+        return enhanced_evaluate(self, to_move, ply)
+
+    def find_move(self, color, frm, to):
+        """Return color's legal move frm -> to, or None if there is none."""
+        if not (self.pieces(color) >> frm) & 1:
+            return None
+        caps = self.piece_moves(frm).get(to)
+        if caps is None:
+            return None
+        return (frm, to, caps)
+
+    def pieces(self, color):
+        return self.red if color == RED else self.white
+
+    def count(self, color):
+        return popcount(self.pieces(color))
+
+    def king_count(self, color):
+        return popcount(self.pieces(color) & self.kings)
+
+    def color_at(self, bit):
+        mask = 1 << bit
+        if self.red & mask:
+            return RED
+        if self.white & mask:
+            return WHITE
+        return None
+
+    def _sides(self, color):
+        """Return (own, opponent, up movers, down movers) for color."""
+        if color == RED:
+            return self.red, self.white, self.red, self.red & self.kings
+        return self.white, self.red, self.white & self.kings, self.white
+
+    def movable(self, color):
+        """Mask of the pieces of color that have at least one legal move."""
+        own, opp, up, down = self._sides(color)
+        empty = BOARD_MASK & ~(own | opp)
+        movable = 0
+        for movers, directions in ((up, UP_DIRECTIONS), (down, DOWN_DIRECTIONS)):
+            if not movers:
+                continue
+            for d in directions:
+                back = -d
+                movable |= movers & shift(empty | (opp & shift(empty, back)), back)
+        return movable
+
+    def has_moves(self, color):
+        return self.movable(color) != 0
+
+    def mobility(self, color):
+        """Return (pieces that can move, total king destinations) for color.
+
+        Counted with shifts and masks; only kings that can jump are walked
+        square by square.
+        """
+        movable = self.movable(color)
+        own, opp, _, _ = self._sides(color)
+        empty = BOARD_MASK & ~(own | opp)
+        kings = own & self.kings
+        king_moves = 0
+        if kings:
+            jumpers = 0
+            for d in UP_DIRECTIONS + DOWN_DIRECTIONS:
+                king_moves += popcount(shift(kings, d) & empty)
+                jumpers |= kings & shift(opp & shift(empty, -d), -d)
+            for bit in bits(jumpers):
+                jumps = {}
+                self._jumps(bit, UP_DIRECTIONS, opp, empty, 0, jumps)
+                self._jumps(bit, DOWN_DIRECTIONS, opp, empty, 0, jumps)
+                king_moves += len(jumps)
+        return popcount(movable), king_moves
+
+    def _jumps(self, bit, directions, opp, empty, captured, moves):
+        for d in directions:
+            over = STEP[d][bit]
+            if over < 0 or not (opp >> over) & 1:
+                continue
+            land = STEP[d][over]
+            if land < 0 or not (empty >> land) & 1:
+                continue
+            caps = captured | (1 << over)
+            moves[land] = caps
+            self._jumps(land, directions, opp, empty, caps, moves)
+
+    def piece_moves(self, bit):
+        """Return {destination: captured mask} for the piece on bit.
+
+        A jump may continue with further jumps in the same vertical direction;
+        every landing square along the way is a move of its own.
+        """
+        color = self.color_at(bit)
+        own, opp, _, _ = self._sides(color)
+        empty = BOARD_MASK & ~(own | opp)
+        king = (self.kings >> bit) & 1
+        moves = {}
+        groups = []
+        if color == RED or king:
+            groups.append(UP_DIRECTIONS)
+        if color == WHITE or king:
+            groups.append(DOWN_DIRECTIONS)
+        for directions in groups:
+            for d in directions:
+                to = STEP[d][bit]
+                if to < 0:
+                    continue
+                if (empty >> to) & 1:
+                    moves[to] = 0
+                elif (opp >> to) & 1:
+                    land = STEP[d][to]
+                    if land >= 0 and (empty >> land) & 1:
+                        moves[land] = 1 << to
+                        self._jumps(land, directions, opp, empty, 1 << to, moves)
+        return moves
+
+    def generate_moves(self, color):
+        """Return every legal move of color as (from, to, captured mask).
+
+        Captures come first; quiet moves are produced a whole direction at a
+        time with one shift per direction.
+        """
+        own, opp, up, down = self._sides(color)
+        empty = BOARD_MASK & ~(own | opp)
+        moves = self._captures(opp, up, down, empty)
+        for movers, directions in ((up, UP_DIRECTIONS), (down, DOWN_DIRECTIONS)):
+            for d in directions:
+                for to in bits(shift(movers, d) & empty):
+                    moves.append((to - d, to, 0))
+        return moves
+
+    def generate_captures(self, color):
+        """Return only the capture moves of color, in generate_moves order.
+
+        Used by the quiescence search, which never needs the quiet moves.
+        """
+        own, opp, up, down = self._sides(color)
+        return self._captures(opp, up, down, BOARD_MASK & ~(own | opp))
+
+    def _captures(self, opp, up, down, empty):
+        # Pieces without a jump are filtered out with shifts; only the jump
+        # chains of the rest are walked.
+        jumpers = 0
+        for movers, directions in ((up, UP_DIRECTIONS), (down, DOWN_DIRECTIONS)):
+            for d in directions:
+                jumpers |= movers & shift(opp & shift(empty, -d), -d)
+        moves = []
+        for frm in bits(jumpers):
+            jumps = {}
+            if (up >> frm) & 1:
+                self._jumps(frm, UP_DIRECTIONS, opp, empty, 0, jumps)
+            if (down >> frm) & 1:
+                self._jumps(frm, DOWN_DIRECTIONS, opp, empty, 0, jumps)
+            for to, caps in jumps.items():
+                moves.append((frm, to, caps))
+        return moves
+
+    def move_piece(self, frm, to):
+        """Move the piece on frm to to, promoting it on the far row.
+
+        Returns True if the move promoted the piece.
+        """
+        frm_mask, to_mask = 1 << frm, 1 << to
+        if self.red & frm_mask:
+            self.red ^= frm_mask | to_mask
+            promote = to_mask & TOP_ROW_MASK
+            man_keys, king_keys = ZOBRIST_RED, ZOBRIST_RED_KING
+            man_pst, king_pst = PST_RED, PST_RED_KING
+        else:
+            self.white ^= frm_mask | to_mask
+            promote = to_mask & BOTTOM_ROW_MASK
+            man_keys, king_keys = ZOBRIST_WHITE, ZOBRIST_WHITE_KING
+            man_pst, king_pst = PST_WHITE, PST_WHITE_KING
+        if self.kings & frm_mask:
+            self.kings ^= frm_mask | to_mask
+            self.hash ^= king_keys[frm] ^ king_keys[to]
+            self.score += king_pst[to] - king_pst[frm]
+            return False
+        if promote:
+            self.kings |= to_mask
+            self.hash ^= man_keys[frm] ^ king_keys[to]
+            self.score += king_pst[to] - man_pst[frm]
+            return True
+        self.hash ^= man_keys[frm] ^ man_keys[to]
+        self.score += man_pst[to] - man_pst[frm]
+        return False
+
+    def remove(self, mask):
+        for bit in bits(mask & (self.red | self.white)):
+            king = (self.kings >> bit) & 1
+            if (self.red >> bit) & 1:
+                self.hash ^= ZOBRIST_RED_KING[bit] if king else ZOBRIST_RED[bit]
+                self.score -= PST_RED_KING[bit] if king else PST_RED[bit]
+            else:
+                self.hash ^= ZOBRIST_WHITE_KING[bit] if king else ZOBRIST_WHITE[bit]
+                self.score -= PST_WHITE_KING[bit] if king else PST_WHITE[bit]
+        self.red &= ~mask
+        self.white &= ~mask
+        self.kings &= ~mask
+
+    def make_move(self, move):
+        """Play move = (from, to, captured mask) in place and return its undo record.
+
+        The undo record is the previous masks, hash and score, which covers the
+        moved piece, captured pieces, promotion and every derived count.
+        """
+        undo = self.snapshot()
+        frm, to, caps = move
+        self.move_piece(frm, to)
+        if caps:
+            self.remove(caps)
+        return undo
+
+    def snapshot(self):
+        """Return an undo record that restores the current position."""
+        return (self.red, self.white, self.kings, self.hash, self.score)
+
+    def unmake_move(self, undo):
+        self.red, self.white, self.kings, self.hash, self.score = undo
+
+    def winner(self, turn=None):
+        """Return the winning color or None.
+
+        With turn given only the side to move is checked for legal moves,
+        which is all a game in progress needs; the other side is checked
+        when its turn comes.
+        """
+        if not self.red:
+            return WHITE
+        elif not self.white:
+            return RED
+
+        # Check for no valid moves (stalemate)
+        if turn != WHITE and not self.has_moves(RED):
+            return WHITE
+        if turn != RED and not self.has_moves(WHITE):
+            return RED
+
+        return None
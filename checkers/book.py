@@ -0,0 +1,218 @@
+"""Opening book: offline builder and memory-mapped lookup.
+
+``python -m checkers.book --plies 6 --depth 8`` searches every position of
+the first plies of the game and keeps, for each, the moves scoring within
+a margin of the best; ``--games`` builds the book from self-play records
+instead. The file is a header, the sorted Zobrist keys (one per book move)
+and a parallel array of (from, to, weight) entries, so a lookup is one
+bisect over the mapped key array.
+"""
+
+import argparse
+import bisect
+import mmap
+import os
+import random
+import struct
+import sys
+import time
+
+from .bitboard import BitBoard
+from .constants import RED, TT_SIZE_MB, WHITE
+from .layout import format_move, parse_move
+from .notation import game_records
+from .search import SearchState, minimax
+from .tt import TranspositionTable
+
+BOOK_MAGIC = b'CKBK'
+BOOK_VERSION = 1
+BOOK_HEADER = struct.Struct('<4sHHQ')  # magic, version, plies, entry count
+BOOK_ENTRY = struct.Struct('<BBH')  # from, to, weight
+BOOK_MARGIN = 30  # Moves within this many hundredths of the best are kept
+MAX_WEIGHT = 0xFFFF
+
+
+class OpeningBook:
+    """Read-only opening book backed by mmap."""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.plies, self.count = BOOK_HEADER.unpack_from(self.map, 0)
+        if magic != BOOK_MAGIC or version != BOOK_VERSION:
+            self.close()
+            raise ValueError("{} is not a version {} opening book".format(path, BOOK_VERSION))
+        start = BOOK_HEADER.size
+        self.keys = memoryview(self.map)[start:start + 8 * self.count].cast('Q')
+        self.entries = start + 8 * self.count
+
+    @classmethod
+    def open(cls, path):
+        """Return the book at path, or None if there is no such file."""
+        return cls(path) if path and os.path.exists(path) else None
+
+    def close(self):
+        if getattr(self, 'keys', None) is not None:
+            self.keys.release()
+            self.keys = None
+        self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def moves(self, bb, color):
+        """Return [(move, weight), ...] for color to move in bb; empty when out of book."""
+        key = bb.key(color)
+        found = []
+        index = bisect.bisect_left(self.keys, key)
+        while index < self.count and self.keys[index] == key:
+            frm, to, weight = BOOK_ENTRY.unpack_from(self.map, self.entries + index * BOOK_ENTRY.size)
+            move = bb.find_move(color, frm, to)  # Also guards against key collisions
+            if move is not None and weight:
+                found.append((move, weight))
+            index += 1
+        return found
+
+    def choose(self, bb, color, rng=random):
+        """Pick a book move at random in proportion to its weight, or None."""
+        found = self.moves(bb, color)
+        if not found:
+            return None
+        moves, weights = zip(*found)
+        return rng.choices(moves, weights)[0]
+
+
+def write_book(path, plies, book):
+    """Write book ({position key: {(from, to): weight}}) to path, sorted by key."""
+    records = sorted((key, frm, to, min(MAX_WEIGHT, max(1, round(weight))))
+                     for key, moves in book.items() for (frm, to), weight in moves.items() if weight > 0)
+    temp = path + '.tmp'
+    with open(temp, 'wb') as out:
+        out.write(BOOK_HEADER.pack(BOOK_MAGIC, BOOK_VERSION, plies, len(records)))
+        out.write(struct.pack('={}Q'.format(len(records)), *(record[0] for record in records)))
+        for _, frm, to, weight in records:
+            out.write(BOOK_ENTRY.pack(frm, to, weight))
+    os.replace(temp, path)
+    return len(records)
+
+
+def score_moves(red, white, kings, color, depth, tt_mb=TT_SIZE_MB):
+    """Search every move of color to depth plies; return [(move, score for color)] best first."""
+    bb = BitBoard(red, white, kings)
+    tt = TranspositionTable(tt_mb)
+    scored = []
+    for move in bb.generate_moves(color):
+        undo = bb.make_move(move)
+        score = minimax(bb, depth - 1, color == RED, None, state=SearchState(tt))[0]
+        bb.unmake_move(undo)
+        scored.append((move, score if color == WHITE else -score))
+    scored.sort(key=lambda item: item[1], reverse=True)
+    return scored
+
+
+def _score_moves_worker(args):
+    return args, score_moves(*args)
+
+
+def build_from_search(plies=6, depth=8, margin=BOOK_MARGIN, workers=None, log=None):
+    """Search the opening tree ply by ply; return {position key: {(from, to): weight}}.
+
+    Every move within margin of the best is kept with a weight that falls
+    off linearly with its score gap, and only kept moves are expanded.
+    Positions of one ply are searched in parallel worker processes.
+    """
+    from concurrent.futures import ProcessPoolExecutor  # Only the builder needs worker processes
+
+    book = {}
+    frontier = {BitBoard.initial().key(RED): (BitBoard.initial(), RED)}
+    with ProcessPoolExecutor(workers or os.cpu_count() or 1) as pool:
+        for ply in range(plies):
+            start = time.perf_counter()
+            jobs = [(bb.red, bb.white, bb.kings, color, depth) for bb, color in frontier.values()]
+            following = {}
+            for (red, white, kings, color, _), scored in pool.map(_score_moves_worker, jobs):
+                if not scored:
+                    continue
+                bb = BitBoard(red, white, kings)
+                best = scored[0][1]
+                kept = {}
+                for move, score in scored:
+                    if best - score > margin:
+                        break
+                    kept[move[:2]] = 1 + (margin - (best - score)) * 100 // (margin or 1)
+                    child = bb.copy()
+                    child.make_move(move)
+                    other = WHITE if color == RED else RED
+                    following[child.key(other)] = (child, other)
+                book[bb.key(color)] = kept
+            if log:
+                log("ply {:2d}  {:6d} positions  {:.1f}s".format(ply + 1, len(frontier), time.perf_counter() - start))
+            frontier = following
+    return book
+
+
+def build_from_games(paths, plies=10, min_games=2):
+    """Count the first plies moves of self-play records; weight by games and score.
+
+    Returns {position key: {(from, to): weight}} for moves played in at least
+    min_games games, weighted by the points the mover scored with them.
+    """
+    stats = {}  # (key, from, to) -> [games, points]
+    for path in paths:
+        for record in game_records(path):
+            if 'FEN' in record['tags']:
+                continue  # Not played from the start position
+            bb = BitBoard.initial()
+            color = RED
+            for text in record['moves'][:plies]:
+                move = parse_move(bb, color, text)
+                if move is None:
+                    break
+                winner = {'red': RED, 'white': WHITE}.get(record['result'])
+                entry = stats.setdefault((bb.key(color), move[0], move[1]), [0, 0.0])
+                entry[0] += 1
+                entry[1] += 0.5 if winner is None else float(winner == color)
+                bb.make_move(move)
+                color = WHITE if color == RED else RED
+    book = {}
+    for (key, frm, to), (games, points) in stats.items():
+        if games >= min_games:
+            book.setdefault(key, {})[(frm, to)] = 1 + 100 * points / games * min(games, 100) / 100
+    return book
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build an opening book.")
+    parser.add_argument('--plies', type=int, default=6, help="book depth in plies from the start")
+    parser.add_argument('--depth', type=int, default=8, help="search depth used to score book moves")
+    parser.add_argument('--margin', type=int, default=BOOK_MARGIN, help="keep moves this close to the best")
+    parser.add_argument('--games', nargs='+',
+                        help="build from self-play JSON lines or .pdn files instead of searching")
+    parser.add_argument('--min-games', type=int, default=2)
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument('--output', default='opening.book')
+    parser.add_argument('--show', action='store_true', help="print the book moves of the start position")
+    args = parser.parse_args(argv)
+
+    if args.show:
+        with OpeningBook(args.output) as book:
+            for move, weight in book.moves(BitBoard.initial(), RED):
+                print("{:8s} {}".format(format_move(move), weight))
+        return 0
+    log = lambda line: print(line, file=sys.stderr)
+    if args.games:
+        book = build_from_games(args.games, args.plies, args.min_games)
+    else:
+        book = build_from_search(args.plies, args.depth, args.margin, args.workers, log)
+    count = write_book(args.output, args.plies, book)
+    log("wrote {} moves for {} positions to {}".format(count, len(book), args.output))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,46 @@
+"""Differential self-checks of the engine.
+
+``python -m checkers.check`` runs every check; name some to run only
+those. Each one compares a fast path with a slow reference on random games
+and stops at the first difference with an AssertionError. This module is
+not imported by the package, so it can run as a script.
+"""
+
+import argparse
+import sys
+
+from .evaluation import verify_evaluation
+from .notation import verify_games
+
+
+def check_evaluation(games, seed):
+    return "evaluation  {} positions".format(verify_evaluation(games, seed=seed))
+
+
+def check_notation(games, seed):
+    return "notation    {} moves".format(verify_games(games, seed=seed))
+
+
+CHECKS = {
+    'evaluation': check_evaluation,  # Incremental evaluation against a full rescan
+    'notation': check_notation,  # Games written as PDN, read back and replayed
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the engine's differential self-checks.")
+    parser.add_argument('checks', nargs='*', metavar='CHECK',
+                        help="checks to run: {} (default: all)".format(', '.join(sorted(CHECKS))))
+    parser.add_argument('--games', type=int, default=100, help="random games per check")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.checks if name not in CHECKS]
+    if unknown:
+        parser.error("unknown check {} (choose from {})".format(', '.join(unknown), ', '.join(sorted(CHECKS))))
+    for name in args.checks or sorted(CHECKS):
+        print(CHECKS[name](args.games, args.seed))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,22 @@
+"""Board size, colors and engine settings shared by the whole package."""
+
+ROWS, COLS = 10, 10  # 10x10 board
+
+# Piece colors double as the side identifiers used throughout the engine
+RED = (255, 0, 0)
+WHITE = (255, 255, 255)
+
+TT_SIZE_MB = 16  # Transposition table size used by the AI
+AI_TIME_MS = 1000  # Thinking time per AI move
+MAX_SEARCH_DEPTH = 64
+QUIESCENCE_DEPTH = 16  # Most capture plies searched past the horizon
+BOOK_PATH = 'opening.book'  # Used by the AI if present; build with python -m checkers.book
+TABLEBASE_PATH = 'endgame.tb'  # Used by the AI if present; build with python -m checkers.tablebase
+EVAL_WEIGHTS_PATH = 'eval_weights.json'  # Written by python -m checkers.tune
+EVAL_WEIGHTS_ENV = 'CHECKERS_EVAL_WEIGHTS'  # Environment variable naming a weights file to play with
+PONDER = False  # Search during the human's turn; off by default to keep idle CPU use low
+SEARCH_WORKERS = 1  # Processes used by the AI; more than 1 enables ParallelSearch
+HISTORY_STRIDE = 64  # history table is indexed by from * HISTORY_STRIDE + to
+HISTORY_MAX = 1 << 20
+WIN_SCORE = 1000000  # Score of a won position, minus the plies needed to reach it
+WIN_THRESHOLD = WIN_SCORE - 1000
@@ -0,0 +1,252 @@
+"""Position evaluation: weights, piece-square tables and the scoring functions."""
+
+import os
+import random
+
+from .constants import ROWS, COLS, EVAL_WEIGHTS_ENV, RED, WHITE, WIN_SCORE
+from .layout import (BIT_COL, BIT_ROW, BOTTOM_ROW_MASK, KEY_SLOTS, SQUARE_BIT, TOP_ROW_MASK,
+                     bits, popcount)
+
+
+# Evaluation weights in hundredths of a man, so every score is an exact
+# integer and incremental sums agree with a full rescan.
+EVAL_WEIGHTS = {
+    'piece': 100,
+    'king': 200,  # Increased king value for 10x10
+    'center': 15,  # Per step closer to the center than COLS // 2
+    'king_bonus': 80,  # Kings are very valuable in 10x10
+    'king_advanced': 40,  # King on the opponent's side
+    'king_center': 30,  # King in the central rows and columns
+    'advancement': 25,  # Per row, for men
+    'back_row': 40,  # Man still guarding its own back row
+    'mobility': 15,  # Per piece that has a legal move
+    'king_mobility': 10,  # Per king destination
+}
+DEFAULT_WEIGHTS = dict(EVAL_WEIGHTS)  # EVAL_WEIGHTS is updated in place by use_weights
+
+
+def read_weights(path):
+    """Return the weights stored in a JSON config file ({term: integer}).
+
+    Raises ValueError for unknown terms or non-integer values.
+    """
+    import json  # Only needed when weights are read
+
+    with open(path) as config:
+        weights = json.load(config)
+    if not isinstance(weights, dict):
+        raise ValueError("{}: expected an object of weights".format(path))
+    for term, value in weights.items():
+        if term not in EVAL_WEIGHTS or not isinstance(value, int):
+            raise ValueError("{}: bad weight {!r}: {!r}".format(path, term, value))
+    return weights
+
+
+def write_weights(path, weights):
+    """Write weights as a JSON config file that read_weights accepts."""
+    import json
+
+    temp = path + '.tmp'
+    with open(temp, 'w') as config:
+        json.dump({term: int(round(weights[term])) for term in EVAL_WEIGHTS if term in weights}, config, indent=2)
+        config.write('\n')
+    os.replace(temp, path)
+
+
+CENTER_ROWS = range(3, 7)  # Center rows for 10x10 board
+CENTER_COLS = range(3, 7)  # Center columns for 10x10 board
+
+
+def piece_square_value(color, king, row, col, weights=EVAL_WEIGHTS):
+    """Material plus positional value of one piece, positive for WHITE."""
+    distance_to_center = abs(col - COLS // 2) + abs(row - ROWS // 2)
+    value = weights['piece'] + (COLS // 2 - distance_to_center) * weights['center']
+    if king:
+        value += weights['king'] + weights['king_bonus']
+        advanced = row < ROWS // 2 if color == WHITE else row > ROWS // 2
+        if advanced:
+            value += weights['king_advanced']
+        if row in CENTER_ROWS and col in CENTER_COLS:
+            value += weights['king_center']
+    elif color == WHITE:
+        value += (ROWS - 1 - row) * weights['advancement']
+        if row == 0:
+            value += weights['back_row']
+    else:
+        value += row * weights['advancement']
+        if row == ROWS - 1:
+            value += weights['back_row']
+    return value if color == WHITE else -value
+
+
+def build_piece_square_tables(weights=EVAL_WEIGHTS):
+    """Return (red man, red king, white man, white king) tables indexed by bit."""
+    tables = []
+    for color, king in ((RED, False), (RED, True), (WHITE, False), (WHITE, True)):
+        table = [0] * KEY_SLOTS
+        for bit in BIT_ROW:
+            table[bit] = piece_square_value(color, king, BIT_ROW[bit], BIT_COL[bit], weights)
+        tables.append(table)
+    return tuple(tables)
+
+
+PST_RED, PST_RED_KING, PST_WHITE, PST_WHITE_KING = build_piece_square_tables()
+
+
+def use_weights(weights=None):
+    """Evaluate with weights (missing terms take DEFAULT_WEIGHTS); return True if they changed.
+
+    EVAL_WEIGHTS and the piece-square tables are updated in place, so every
+    module that imported them sees the new values. A BitBoard keeps the
+    score it was built with: make boards after the call, e.g.
+    BitBoard(bb.red, bb.white, bb.kings).
+    """
+    new = dict(DEFAULT_WEIGHTS)
+    new.update(weights or {})
+    if new == EVAL_WEIGHTS:
+        return False
+    EVAL_WEIGHTS.update(new)
+    for table, fresh in zip((PST_RED, PST_RED_KING, PST_WHITE, PST_WHITE_KING), build_piece_square_tables()):
+        table[:] = fresh
+    return True
+
+
+# Tuned weights are only used when asked for. The variable is inherited by
+# worker processes, so a search pool evaluates like the process that made
+# it; a file that cannot be read leaves the defaults in place.
+if os.environ.get(EVAL_WEIGHTS_ENV):
+    try:
+        use_weights(read_weights(os.environ[EVAL_WEIGHTS_ENV]))
+    except (OSError, ValueError) as exc:
+        import warnings
+
+        warnings.warn("{}: {}; using the default evaluation weights".format(EVAL_WEIGHTS_ENV, exc))
+
+
+def material_score(red, white, kings):
+    score = 0
+    for bit in bits(red):
+        score += PST_RED_KING[bit] if (kings >> bit) & 1 else PST_RED[bit]
+    for bit in bits(white):
+        score += PST_WHITE_KING[bit] if (kings >> bit) & 1 else PST_WHITE[bit]
+    return score
+
+
+def enhanced_evaluate(bb, to_move=None, ply=0):
+    """Score bb from WHITE's point of view, in hundredths of a man.
+
+    Material, centrality, advancement and back-row terms are kept in
+    bb.score as pieces move; only mobility is counted here. If to_move is
+    given and has no piece that can move, the position is scored as lost
+    for it ply plies from the root.
+    """
+    white_moves, white_king_moves = bb.mobility(WHITE)
+    red_moves, red_king_moves = bb.mobility(RED)
+    if to_move == WHITE and not white_moves:
+        return ply - WIN_SCORE
+    if to_move == RED and not red_moves:
+        return WIN_SCORE - ply
+    return (bb.score +
+            (white_moves - red_moves) * EVAL_WEIGHTS['mobility'] +
+            (white_king_moves - red_king_moves) * EVAL_WEIGHTS['king_mobility'])
+
+
+def evaluate_full(bb):
+    """Reference evaluation that rescans every square; must equal enhanced_evaluate."""
+    white, red, kings = bb.white, bb.red, bb.kings
+    w = EVAL_WEIGHTS
+
+    # Piece count evaluation
+    piece_score = (popcount(white) - popcount(red)) * w['piece']
+
+    # King evaluation (kings are more valuable)
+    king_score = (popcount(white & kings) - popcount(red & kings)) * w['king']
+
+    # Positional evaluation
+    positional_score = 0
+    for row in range(ROWS):
+        for col in range(COLS):
+            bit = SQUARE_BIT[row][col]
+            if bit < 0 or not ((white | red) >> bit) & 1:
+                continue
+            # Central control bonus (more important in 10x10)
+            distance_to_center = abs(col - COLS//2) + abs(row - ROWS//2)
+            center_bonus = (COLS//2 - distance_to_center) * w['center']
+            king = (kings >> bit) & 1
+
+            if (white >> bit) & 1:
+                positional_score += center_bonus
+                if king:
+                    positional_score += w['king_bonus']
+                    # Bonus for being on opponent's side
+                    if row < ROWS//2:
+                        positional_score += w['king_advanced']
+                    # Extra bonus for central control
+                    if row in CENTER_ROWS and col in CENTER_COLS:
+                        positional_score += w['king_center']
+            else:
+                positional_score -= center_bonus
+                if king:
+                    positional_score -= w['king_bonus']
+                    if row > ROWS//2:
+                        positional_score -= w['king_advanced']
+                    if row in CENTER_ROWS and col in CENTER_COLS:
+                        positional_score -= w['king_center']
+
+    # Aggression bonus (pieces closer to promotion)
+    aggression_score = 0
+    for bit in bits(white & ~kings):
+        aggression_score += (ROWS - 1 - BIT_ROW[bit]) * w['advancement']
+    for bit in bits(red & ~kings):
+        aggression_score -= BIT_ROW[bit] * w['advancement']
+
+    # Back row defense bonus (more important in 10x10)
+    back_row_score = popcount(white & ~kings & TOP_ROW_MASK) * w['back_row']
+    back_row_score -= popcount(red & ~kings & BOTTOM_ROW_MASK) * w['back_row']
+
+    # Mobility bonus (number of pieces that can move), counted piece by piece
+    # so it does not share the shift code of BitBoard.mobility
+    white_movable = sum(1 for bit in bits(white) if bb.piece_moves(bit))
+    red_movable = sum(1 for bit in bits(red) if bb.piece_moves(bit))
+    mobility_score = (white_movable - red_movable) * w['mobility']
+
+    # King mobility bonus (separate from piece mobility)
+    king_mobility_score = 0
+    for bit in bits(white & kings):
+        king_mobility_score += len(bb.piece_moves(bit)) * w['king_mobility']
+    for bit in bits(red & kings):
+        king_mobility_score -= len(bb.piece_moves(bit)) * w['king_mobility']
+
+    return (piece_score + king_score + positional_score +
+            aggression_score + back_row_score +
+            mobility_score + king_mobility_score)
+
+
+def verify_evaluation(games=100, plies=150, seed=0):
+    """Differential check of enhanced_evaluate against evaluate_full.
+
+    Plays random games with make_move, also undoing a random move at every
+    ply, and compares both evaluations in every position reached. Raises
+    AssertionError on the first mismatch; returns the number of positions.
+    """
+    from .bitboard import BitBoard
+
+    rng = random.Random(seed)
+    checked = 0
+    for _ in range(games):
+        bb = BitBoard.initial()
+        color = RED
+        for _ in range(plies):
+            moves = bb.generate_moves(color)
+            if not moves:
+                break
+            undo = bb.make_move(rng.choice(moves))
+            bb.unmake_move(undo)
+            bb.make_move(rng.choice(moves))
+            fresh = BitBoard(bb.red, bb.white, bb.kings)
+            incremental, full = enhanced_evaluate(bb), evaluate_full(bb)
+            assert incremental == full == enhanced_evaluate(fresh), (bb.red, bb.white, bb.kings, incremental, full)
+            checked += 1
+            color = WHITE if color == RED else RED
+    return checked
+
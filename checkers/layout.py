@@ -0,0 +1,82 @@
+"""Square numbering of the bitboard and the bit helpers built on it."""
+
+from .constants import ROWS, COLS
+
+
+# Bitboard layout: the 50 playable squares are numbered row by row, COLS // 2
+# per row, with one unused "ghost" bit after every odd row. The ghost bits make
+# every diagonal step a constant shift no matter the row parity, so moves for
+# all pieces of a color can be generated with a handful of shifts and masks.
+HALF = COLS // 2
+UP_LEFT, UP_RIGHT = -(HALF + 1), -HALF
+DOWN_LEFT, DOWN_RIGHT = HALF, HALF + 1
+UP_DIRECTIONS = (UP_LEFT, UP_RIGHT)
+DOWN_DIRECTIONS = (DOWN_LEFT, DOWN_RIGHT)
+
+SQUARE_BIT = [[-1] * COLS for _ in range(ROWS)]  # (row, col) -> bit, -1 if light
+BIT_ROW = {}
+BIT_COL = {}
+for _row in range(ROWS):
+    for _col in range(COLS):
+        if _col % 2 == (_row + 1) % 2:
+            _bit = _row * HALF + _col // 2 + _row // 2
+            SQUARE_BIT[_row][_col] = _bit
+            BIT_ROW[_bit] = _row
+            BIT_COL[_bit] = _col
+
+BOARD_MASK = 0
+for _bit in BIT_ROW:
+    BOARD_MASK |= 1 << _bit
+TOP_ROW_MASK = sum(1 << SQUARE_BIT[0][c] for c in range(COLS) if SQUARE_BIT[0][c] >= 0)
+BOTTOM_ROW_MASK = sum(1 << SQUARE_BIT[ROWS - 1][c] for c in range(COLS) if SQUARE_BIT[ROWS - 1][c] >= 0)
+
+# STEP[d][bit] is the square one diagonal step away in direction d, or -1
+STEP = {}
+for _d in UP_DIRECTIONS + DOWN_DIRECTIONS:
+    STEP[_d] = {}
+    for _bit in BIT_ROW:
+        _to = _bit + _d
+        STEP[_d][_bit] = _to if _to in BIT_ROW and abs(BIT_COL[_to] - BIT_COL[_bit]) == 1 else -1
+
+# Draughts notation numbers the playable squares 1..50 row by row from the top
+SQUARE_NUMBER = {_bit: BIT_ROW[_bit] * HALF + BIT_COL[_bit] // 2 + 1 for _bit in BIT_ROW}
+NUMBER_BIT = {_number: _bit for _bit, _number in SQUARE_NUMBER.items()}
+
+
+def shift(mask, d):
+    """Shift every bit of mask one diagonal step in direction d."""
+    if d > 0:
+        return (mask << d) & BOARD_MASK
+    return mask >> -d
+
+
+def bits(mask):
+    """Yield the square index of every set bit in mask."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def popcount(mask):
+    return bin(mask).count('1')
+
+
+KEY_SLOTS = max(BIT_ROW) + 1  # Length of tables indexed by square bit
+
+
+def format_move(move):
+    """Write move in draughts notation: "32-28" for a step, "28x19" for a capture."""
+    frm, to, caps = move
+    return '{}{}{}'.format(SQUARE_NUMBER[frm], 'x' if caps else '-', SQUARE_NUMBER[to])
+
+
+def parse_move(bb, color, text):
+    """Return color's move written in draughts notation ("32-28" or "28x19"), or None."""
+    try:
+        frm, to = (int(square) for square in text.replace('x', '-').split('-'))
+    except ValueError:
+        return None
+    if frm not in NUMBER_BIT or to not in NUMBER_BIT:
+        return None
+    return bb.find_move(color, NUMBER_BIT[frm], NUMBER_BIT[to])
@@ -0,0 +1,303 @@
+"""Position and game notation: FEN-like text, packed binary and PDN records.
+
+A position is written as ``R:R31,32,K45:W1,2,3``: the side to move, then
+each side's squares in draughts numbering (1-50 row by row from the top)
+with K marking kings. pack_position() stores the same position in
+POSITION_SIZE bytes, so datasets of positions can be appended to and read
+back in fixed-size records.
+
+Games are written as PDN: tag pairs, then numbered moves ("32-28",
+"28x19") and a result. GameWriter appends and flushes one game at a time
+and read_games() streams games back, so neither holds a whole file in
+memory.
+"""
+
+from .bitboard import BitBoard
+from .constants import RED, WHITE
+from .layout import HALF, NUMBER_BIT, SQUARE_NUMBER, bits, format_move, parse_move
+
+SIDE_LETTER = {RED: 'R', WHITE: 'W'}
+LETTER_SIDE = {letter: color for color, letter in SIDE_LETTER.items()}
+
+# Packed positions drop the ghost bits: every pair of rows is 2 * HALF
+# squares wide in the bitboard, followed by one ghost bit.
+PAIR_SQUARES = 2 * HALF
+PAIR_STRIDE = PAIR_SQUARES + 1
+PAIR_MASK = (1 << PAIR_SQUARES) - 1
+PAIRS = len(SQUARE_NUMBER) // PAIR_SQUARES
+SQUARES = PAIRS * PAIR_SQUARES
+POSITION_SIZE = (3 * SQUARES + 1 + 7) // 8  # red, white and king masks plus the side to move
+
+RESULT_TOKENS = {'red': '2-0', 'white': '0-2', 'draw': '1-1', None: '*'}
+TOKEN_RESULTS = {token: result for result, token in RESULT_TOKENS.items()}
+LINE_WIDTH = 80
+
+
+def to_fen(bb, color):
+    """Return the FEN-like text of bb with color to move."""
+    sections = [SIDE_LETTER[color]]
+    for side in (RED, WHITE):
+        pieces = bb.pieces(side)
+        squares = sorted(SQUARE_NUMBER[bit] for bit in bits(pieces))
+        sections.append(SIDE_LETTER[side] + ','.join(
+            ('K' if (bb.kings >> NUMBER_BIT[number]) & 1 else '') + str(number) for number in squares))
+    return ':'.join(sections)
+
+
+def from_fen(text):
+    """Parse FEN-like text; return (BitBoard, color to move).
+
+    Raises ValueError if the text is not a valid position.
+    """
+    sections = text.strip().rstrip('.').split(':')
+    if len(sections) != 3 or sections[0].upper() not in LETTER_SIDE:
+        raise ValueError("bad position {!r}".format(text))
+    masks = {RED: 0, WHITE: 0}
+    kings = 0
+    for section in sections[1:]:
+        side = LETTER_SIDE.get(section[:1].upper())
+        if side is None:
+            raise ValueError("bad side in {!r}".format(text))
+        for square in filter(None, section[1:].split(',')):
+            square = square.strip()
+            king = square[:1].upper() == 'K'
+            bit = NUMBER_BIT.get(int(square[1:] if king else square))
+            if bit is None or ((masks[RED] | masks[WHITE]) >> bit) & 1:
+                raise ValueError("bad square {!r} in {!r}".format(square, text))
+            masks[side] |= 1 << bit
+            if king:
+                kings |= 1 << bit
+    return BitBoard(masks[RED], masks[WHITE], kings), LETTER_SIDE[sections[0].upper()]
+
+
+INITIAL_FEN = to_fen(BitBoard.initial(), RED)
+
+
+def squeeze(mask):
+    """Drop the ghost bits of a bitboard mask; square i of the result is the i-th playable square."""
+    packed = 0
+    for pair in range(PAIRS):
+        packed |= ((mask >> (pair * PAIR_STRIDE)) & PAIR_MASK) << (pair * PAIR_SQUARES)
+    return packed
+
+
+def spread(packed):
+    """Inverse of squeeze."""
+    mask = 0
+    for pair in range(PAIRS):
+        mask |= ((packed >> (pair * PAIR_SQUARES)) & PAIR_MASK) << (pair * PAIR_STRIDE)
+    return mask
+
+
+def pack_position(bb, color):
+    """Return bb with color to move as POSITION_SIZE bytes."""
+    value = (squeeze(bb.red) | squeeze(bb.white) << SQUARES | squeeze(bb.kings) << (2 * SQUARES) |
+             (color == WHITE) << (3 * SQUARES))
+    return value.to_bytes(POSITION_SIZE, 'little')
+
+
+def unpack_position(data):
+    """Inverse of pack_position: return (BitBoard, color to move)."""
+    value = int.from_bytes(data, 'little')
+    red = spread(value & ((1 << SQUARES) - 1))
+    white = spread((value >> SQUARES) & ((1 << SQUARES) - 1))
+    kings = spread((value >> (2 * SQUARES)) & ((1 << SQUARES) - 1))
+    return BitBoard(red, white, kings), WHITE if (value >> (3 * SQUARES)) & 1 else RED
+
+
+def write_positions(out, positions):
+    """Append (BitBoard, color) pairs to the binary file object out; return the count."""
+    count = 0
+    for bb, color in positions:
+        out.write(pack_position(bb, color))
+        count += 1
+    return count
+
+
+def iter_positions(path, chunk=4096):
+    """Yield (BitBoard, color) from a file of packed positions, chunk records at a time."""
+    with open(path, 'rb') as records:
+        while True:
+            data = records.read(chunk * POSITION_SIZE)
+            if not data:
+                break
+            if len(data) % POSITION_SIZE:
+                raise ValueError("{} ends with a partial position".format(path))
+            for offset in range(0, len(data), POSITION_SIZE):
+                yield unpack_position(data[offset:offset + POSITION_SIZE])
+
+
+def format_game(moves, result=None, tags=None, first=RED):
+    """Return one game as PDN text: tag pairs, a blank line and the move text.
+
+    moves are engine moves or move strings; first is the side that plays
+    moves[0].
+    """
+    lines = ['[{} "{}"]'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+             for name, value in (tags or {}).items() if name != 'Result']
+    lines.append('[Result "{}"]'.format(RESULT_TOKENS[result]))
+    tokens = []  # A move number stays on the same line as its move
+    number = 1
+    color = first
+    for index, move in enumerate(moves):
+        text = move if isinstance(move, str) else format_move(move)
+        if color == RED:
+            tokens.append('{}. {}'.format(number, text))
+        else:
+            tokens.append('1... ' + text if index == 0 else text)
+            number += 1
+        color = WHITE if color == RED else RED
+    tokens.append(RESULT_TOKENS[result])
+    movetext = ['']
+    for token in tokens:
+        if movetext[-1] and len(movetext[-1]) + 1 + len(token) > LINE_WIDTH:
+            movetext.append(token)
+        else:
+            movetext[-1] = movetext[-1] + ' ' + token if movetext[-1] else token
+    return '\n'.join(lines + [''] + movetext + ['']) + '\n'
+
+
+class GameWriter:
+    """Append games to a PDN file, flushing after each so readers see whole games."""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'a')
+
+    def write(self, moves, result=None, tags=None, start=None):
+        """Append one game; start is the FEN of its first position if not the usual one."""
+        tags = dict(tags or {})
+        first = RED
+        if start is not None and start != INITIAL_FEN:
+            tags['FEN'] = start
+            first = from_fen(start)[1]
+        self.file.write(format_game(moves, result, tags, first))
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_games(path):
+    """Yield every game in a PDN file as {'tags': {...}, 'moves': [...], 'result': ...}.
+
+    The file is read line by line. result is 'red', 'white', 'draw' or None;
+    moves are strings as written, checked only by replay().
+    """
+    import re  # Imported on use: re is slow to import and only the reader needs it
+
+    tag_line = re.compile(r'\[(\w+)\s+"((?:[^"\\]|\\.)*)"\]')
+    move_number = re.compile(r'^\d+\.+$')
+    with open(path) as records:
+        tags = {}
+        moves = []
+        for line in records:
+            line = re.sub(r'\{[^}]*\}', ' ', line).strip()
+            if not line:
+                continue
+            if line.startswith('['):
+                if moves:
+                    yield {'tags': tags, 'moves': moves, 'result': TOKEN_RESULTS.get(tags.get('Result'))}
+                    tags, moves = {}, []
+                for name, value in tag_line.findall(line):
+                    tags[name] = re.sub(r'\\(.)', r'\1', value)
+                continue
+            for token in line.split():
+                if token in TOKEN_RESULTS:
+                    yield {'tags': tags, 'moves': moves, 'result': TOKEN_RESULTS[token]}
+                    tags, moves = {}, []
+                elif not move_number.match(token):
+                    moves.append(token)
+        if moves or tags:
+            yield {'tags': tags, 'moves': moves, 'result': TOKEN_RESULTS.get(tags.get('Result'))}
+
+
+def game_records(path):
+    """Yield the games of a PDN file (.pdn) or of self-play JSON lines records.
+
+    Games have the read_games layout either way; JSON records get empty tags.
+    """
+    if path.endswith('.pdn'):
+        yield from read_games(path)
+        return
+    import json  # Imported on use, like re in read_games
+
+    with open(path) as records:
+        for line in records:
+            record = json.loads(line)
+            yield {'tags': {}, 'moves': record['moves'], 'result': record['result']}
+
+
+def replay(game):
+    """Yield (BitBoard, color, move) before each move of a game from read_games.
+
+    The same BitBoard is played forward in place; copy it to keep a
+    position. Raises ValueError on an illegal move.
+    """
+    bb, color = from_fen(game['tags']['FEN']) if 'FEN' in game['tags'] else (BitBoard.initial(), RED)
+    for text in game['moves']:
+        move = parse_move(bb, color, text)
+        if move is None:
+            raise ValueError("illegal move {} in {}".format(text, to_fen(bb, color)))
+        yield bb, color, move
+        bb.make_move(move)
+        color = WHITE if color == RED else RED
+
+
+def verify_games(games=50, plies=200, seed=0):
+    """Round-trip random games through format_game, read_games and replay.
+
+    Writes the games to a temporary PDN file, half of them from a FEN
+    start, reads them back and replays every move, comparing positions.
+    Raises AssertionError on the first difference; returns the number of
+    moves checked.
+    """
+    import os
+    import random
+    import tempfile
+
+    rng = random.Random(seed)
+    played = []
+    for game in range(games):
+        bb, color = BitBoard.initial(), RED
+        if game % 2:
+            for _ in range(rng.randrange(1, 12)):
+                moves = bb.generate_moves(color)
+                bb.make_move(rng.choice(moves))
+                color = WHITE if color == RED else RED
+        start = to_fen(bb, color)
+        positions, moves = [], []
+        for _ in range(plies):
+            legal = bb.generate_moves(color)
+            if not legal:
+                break
+            positions.append(pack_position(bb, color))
+            moves.append(rng.choice(legal))
+            bb.make_move(moves[-1])
+            color = WHITE if color == RED else RED
+        played.append((start, moves, positions, rng.choice(list(RESULT_TOKENS))))
+
+    handle, path = tempfile.mkstemp(suffix='.pdn')
+    os.close(handle)
+    try:
+        with GameWriter(path) as writer:
+            for game, (start, moves, _, result) in enumerate(played):
+                writer.write(moves, result, {'Round': game}, start)
+        checked = 0
+        records = list(read_games(path))
+        assert len(records) == len(played), (len(records), len(played))
+        for record, (start, moves, positions, result) in zip(records, played):
+            assert record['result'] == result and len(record['moves']) == len(moves), record
+            for (bb, color, move), packed, want in zip(replay(record), positions, moves):
+                assert pack_position(bb, color) == packed and move == want, (to_fen(bb, color), record)
+                checked += 1
+        return checked
+    finally:
+        os.remove(path)
+
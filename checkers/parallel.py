@@ -0,0 +1,205 @@
+"""Multi-process (Lazy SMP) search and its benchmark.
+
+``python -m checkers.parallel`` times fixed-depth searches of a position
+suite with 1, 2, 4, ... workers (up to the number of cores) and prints the
+speedup and extra nodes searched against one worker.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from .bitboard import BitBoard
+from .constants import AI_TIME_MS, MAX_SEARCH_DEPTH, RED, SEARCH_WORKERS, TT_SIZE_MB, WHITE
+from .search import SearchState, iterative_deepening
+from .tt import TranspositionTable
+
+
+# Parallel search (Lazy SMP): every worker process runs iterative deepening on
+# the same position and they share one transposition table in shared memory,
+# so bounds and best moves found by one worker cut the work of the others.
+SMP_CONTROL_BYTES = 8  # Byte 0 of the shared block is the stop flag
+_worker_shm = None
+_worker_tt = None
+
+
+class SharedSearchState(SearchState):
+    """SearchState whose stop flag lives in the shared memory block.
+
+    Workers can only raise the flag; ParallelSearch clears it before each
+    search is handed out, so a late-starting helper cannot undo a stop.
+    """
+
+    def __init__(self, tt, control):
+        self.control = control
+        super().__init__(tt)
+
+    @property
+    def stopped(self):
+        return self.control[0] != 0
+
+    @stopped.setter
+    def stopped(self, value):
+        if value:
+            self.control[0] = 1
+
+
+def _attach_shared_tt(name, size_mb):
+    """Pool initializer: map the shared table once per worker process."""
+    global _worker_shm, _worker_tt
+    _worker_shm = shared_memory.SharedMemory(name=name)
+    _worker_tt = TranspositionTable(size_mb, _worker_shm.buf[SMP_CONTROL_BYTES:])
+
+
+def _smp_worker(worker_id, red, white, kings, max_player, time_ms, max_depth, age):
+    _worker_tt.age = age
+    state = SharedSearchState(_worker_tt, _worker_shm.buf)
+    # Helpers start one ply deeper on odd ids so the workers spread over
+    # different depths instead of all searching the same tree in step.
+    start_depth = 1 + (worker_id % 2) if worker_id else 1
+    position = BitBoard(red, white, kings)
+    score, move, depth = iterative_deepening(position, max_player, time_ms, _worker_tt, max_depth,
+                                             state=state, start_depth=start_depth)
+    if worker_id == 0:
+        state.stopped = True  # The main worker is done; stop the helpers
+    return score, move, depth, state.nodes
+
+
+class ParallelSearch:
+    """Search one position with several processes sharing a transposition table.
+
+    The pool and the shared table are created once and stay warm between
+    searches; call close() (or use it as a context manager) when finished.
+    """
+
+    def __init__(self, workers=SEARCH_WORKERS, size_mb=TT_SIZE_MB):
+        self.workers = max(1, workers)
+        self.size_mb = size_mb
+        slots = max(2, int(size_mb * 1024 * 1024) // TranspositionTable.SLOT_BYTES) & ~1
+        self.shm = shared_memory.SharedMemory(
+            create=True, size=SMP_CONTROL_BYTES + slots * TranspositionTable.SLOT_BYTES)
+        self.shm.buf[:SMP_CONTROL_BYTES] = bytes(SMP_CONTROL_BYTES)
+        self.age = 0
+        self.executor = ProcessPoolExecutor(self.workers, initializer=_attach_shared_tt,
+                                            initargs=(self.shm.name, size_mb))
+
+    def search(self, position, max_player, time_ms=AI_TIME_MS, max_depth=MAX_SEARCH_DEPTH, stats=None,
+               reset=True):
+        """Return (score, move, depth) like iterative_deepening.
+
+        The deepest result wins, the main worker's on ties. If stats is a
+        dict it is filled with the total and per-worker node counts. reset
+        clears the stop flag first; a caller that runs the search on another
+        thread calls reset() before starting it and passes reset=False, so
+        a stop() that comes in between is not lost.
+        """
+        self.age = (self.age + 1) & 63
+        if reset:
+            self.reset()
+        futures = [
+            self.executor.submit(_smp_worker, worker_id, position.red, position.white, position.kings,
+                                 max_player, time_ms, max_depth, self.age)
+            for worker_id in range(self.workers)
+        ]
+        results = [future.result() for future in futures]
+        best = results[0]
+        for result in results[1:]:
+            if result[1] is not None and result[2] > best[2]:
+                best = result
+        if stats is not None:
+            stats['workers'] = self.workers
+            stats['worker_nodes'] = [result[3] for result in results]
+            stats['nodes'] = sum(stats['worker_nodes'])
+        return best[0], best[1], best[2]
+
+    def reset(self):
+        self.shm.buf[0] = 0
+
+    def stop(self):
+        self.shm.buf[0] = 1
+
+    def clear(self):
+        self.shm.buf[SMP_CONTROL_BYTES:] = bytes(len(self.shm.buf) - SMP_CONTROL_BYTES)
+
+    def close(self):
+        self.stop()
+        self.executor.shutdown(wait=True)
+        self.shm.close()
+        self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def bench_positions(count=8, seed=1):
+    """Fixed benchmark suite: the start position and positions reached by
+    seeded random play. Returns [(BitBoard, max_player), ...]."""
+    rng = random.Random(seed)
+    positions = [(BitBoard.initial(), True)]
+    while len(positions) < count:
+        bb = BitBoard.initial()
+        color = RED
+        for _ in range(rng.randrange(6, 30)):
+            moves = bb.generate_moves(color)
+            if not moves:
+                break
+            bb.make_move(rng.choice(moves))
+            color = WHITE if color == RED else RED
+        if bb.generate_moves(color):
+            positions.append((bb, color == WHITE))
+    return positions
+
+
+def benchmark_parallel(worker_counts=None, depth=7, positions=None, size_mb=TT_SIZE_MB):
+    """Time fixed-depth searches over a position suite for each worker count.
+
+    Prints and returns rows of (workers, seconds, nodes, speedup, overhead)
+    where speedup is relative to one worker and overhead is the extra
+    fraction of nodes searched.
+    """
+    if worker_counts is None:
+        worker_counts = [1]
+        while worker_counts[-1] * 2 <= (os.cpu_count() or 1):
+            worker_counts.append(worker_counts[-1] * 2)
+    if positions is None:
+        positions = bench_positions()
+    rows = []
+    for workers in worker_counts:
+        with ParallelSearch(workers, size_mb) as searcher:
+            elapsed = nodes = 0
+            for bb, max_player in positions:
+                searcher.clear()
+                stats = {}
+                start = time.perf_counter()
+                searcher.search(bb, max_player, time_ms=10 ** 9, max_depth=depth, stats=stats)
+                elapsed += time.perf_counter() - start
+                nodes += stats['nodes']
+        base_time, base_nodes = (rows[0][1], rows[0][2]) if rows else (elapsed, nodes)
+        row = (workers, elapsed, nodes, base_time / elapsed, nodes / base_nodes - 1)
+        rows.append(row)
+        print("workers {:3d}  time {:8.2f}s  nodes {:10d}  speedup {:5.2f}x  overhead {:+6.1%}".format(*row))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the parallel search against one worker.")
+    parser.add_argument('--workers', type=int, nargs='+', help="worker counts to time (default: 1, 2, 4, ... cores)")
+    parser.add_argument('--depth', type=int, default=7)
+    parser.add_argument('--positions', type=int, default=8, help="positions in the benchmark suite")
+    parser.add_argument('--tt-mb', type=float, default=TT_SIZE_MB)
+    args = parser.parse_args(argv)
+    if args.workers and min(args.workers) < 1:
+        parser.error("--workers must be at least 1")
+    benchmark_parallel(args.workers, args.depth, bench_positions(args.positions), args.tt_mb)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,202 @@
+"""Perft: move generator node counts, timing and regression check.
+
+``python -m checkers.perft --depth 5`` counts the leaf nodes reachable from
+the start position, ``--divide`` splits the count per root move, and
+``--check`` compares every backend against the stored reference counts.
+"""
+
+import argparse
+import sys
+import time
+
+from .bitboard import BitBoard
+from .constants import COLS, RED, ROWS, WHITE
+from .layout import BIT_COL, BIT_ROW, NUMBER_BIT, SQUARE_BIT, bits, format_move
+
+
+def position_from_squares(red=(), white=(), kings=()):
+    """Build a BitBoard from draughts square numbers (1-50)."""
+    def mask(numbers):
+        value = 0
+        for number in numbers:
+            value |= 1 << NUMBER_BIT[number]
+        return value
+    return BitBoard(mask(red), mask(white), mask(kings))
+
+
+# name -> (red squares, white squares, king squares, side to move)
+PERFT_POSITIONS = {
+    'start': (range(31, 51), range(1, 21), (), RED),
+    'opening': ((23, 25, 32, 35, 36, 38, 39, 40, 41, 42, 44, 45, 46, 47, 48, 49, 50),
+                (1, 2, 3, 4, 5, 6, 7, 8, 10, 12, 14, 15, 16, 17, 19, 22, 26), (), RED),
+    'middlegame': ((18, 22, 25, 28, 32, 34, 35, 39, 41, 43, 44, 45, 46, 47, 49, 50),
+                   (1, 5, 6, 7, 8, 9, 10, 13, 14, 15, 16, 20, 23, 24, 37), (), RED),
+    'late': ((19, 22, 28, 32, 35, 36, 37, 43, 44, 45),
+             (5, 7, 8, 9, 10, 13, 14, 23, 26, 29, 40), (), RED),
+    'kings': ((28, 33, 45), (3, 12, 16, 20), (28, 33, 3, 12), WHITE),
+    'multi-jump': ((46, 50, 38), (41, 32, 23, 3, 14), (3,), RED),
+}
+
+# Leaf counts for depths 1, 2, ... from each position in PERFT_POSITIONS
+PERFT_REFERENCE = {
+    'start': [9, 81, 793, 7654, 79010],
+    'opening': [14, 220, 3096, 47448],
+    'middlegame': [13, 147, 1977, 22577],
+    'late': [10, 113, 1185, 14548, 157186],
+    'kings': [9, 63, 569, 5015, 46323],
+    'multi-jump': [8, 55, 303, 2196, 11259, 83244],
+}
+
+
+def load_position(name):
+    red, white, kings, color = PERFT_POSITIONS[name]
+    return position_from_squares(red, white, kings), color
+
+
+def reference_moves(bb, color):
+    """Generate moves by walking a (row, col) grid square by square.
+
+    Deliberately independent of the bitboard shift tables, so the perft
+    counts of the two generators check each other.
+    """
+    grid = {}
+    for bit in bits(bb.red | bb.white):
+        grid[(BIT_ROW[bit], BIT_COL[bit])] = (RED if (bb.red >> bit) & 1 else WHITE, (bb.kings >> bit) & 1)
+
+    def jumps(row, col, step, captured, found):
+        for dc in (-1, 1):
+            over = (row + step, col + dc)
+            land = (row + 2 * step, col + 2 * dc)
+            if not (0 <= land[0] < ROWS and 0 <= land[1] < COLS):
+                continue
+            if over in grid and grid[over][0] != color and land not in grid:
+                caps = captured | 1 << SQUARE_BIT[over[0]][over[1]]
+                found[SQUARE_BIT[land[0]][land[1]]] = caps
+                jumps(land[0], land[1], step, caps, found)
+
+    moves = []
+    for (row, col), (piece_color, king) in sorted(grid.items(), key=lambda item: SQUARE_BIT[item[0][0]][item[0][1]]):
+        if piece_color != color:
+            continue
+        steps = []
+        if color == RED or king:
+            steps.append(-1)
+        if color == WHITE or king:
+            steps.append(1)
+        found = {}
+        for step in steps:
+            for dc in (-1, 1):
+                target = (row + step, col + dc)
+                if not (0 <= target[0] < ROWS and 0 <= target[1] < COLS):
+                    continue
+                if target not in grid:
+                    found[SQUARE_BIT[target[0]][target[1]]] = 0
+                elif grid[target][0] != color:
+                    land = (row + 2 * step, col + 2 * dc)
+                    if 0 <= land[0] < ROWS and 0 <= land[1] < COLS and land not in grid:
+                        caps = 1 << SQUARE_BIT[target[0]][target[1]]
+                        found[SQUARE_BIT[land[0]][land[1]]] = caps
+                        jumps(land[0], land[1], step, caps, found)
+        frm = SQUARE_BIT[row][col]
+        moves.extend((frm, to, caps) for to, caps in found.items())
+    return moves
+
+
+def _piece_by_piece(bb, color):
+    return [(frm, to, caps) for frm in bits(bb.pieces(color)) for to, caps in bb.piece_moves(frm).items()]
+
+
+GENERATORS = {
+    'bitboard': lambda bb, color: bb.generate_moves(color),
+    'per-piece': _piece_by_piece,
+    'reference': reference_moves,
+}
+
+
+def perft(bb, color, depth, generate=GENERATORS['bitboard']):
+    """Count the leaf nodes depth plies below bb, with color to move."""
+    if depth == 0:
+        return 1
+    moves = generate(bb, color)
+    if depth == 1:
+        return len(moves)
+    other = WHITE if color == RED else RED
+    total = 0
+    for move in moves:
+        undo = bb.make_move(move)
+        total += perft(bb, other, depth - 1, generate)
+        bb.unmake_move(undo)
+    return total
+
+
+def divide(bb, color, depth, generate=GENERATORS['bitboard']):
+    """Return [(move in notation, leaf count), ...] for each root move."""
+    other = WHITE if color == RED else RED
+    counts = []
+    for move in generate(bb, color):
+        undo = bb.make_move(move)
+        counts.append((format_move(move), perft(bb, other, depth - 1, generate)))
+        bb.unmake_move(undo)
+    return counts
+
+
+def timed_perft(bb, color, depth, generate=GENERATORS['bitboard']):
+    """Return (nodes, seconds, nodes per second)."""
+    start = time.perf_counter()
+    nodes = perft(bb, color, depth, generate)
+    seconds = time.perf_counter() - start
+    return nodes, seconds, nodes / seconds if seconds else 0.0
+
+
+def check(backends=None, log=print):
+    """Compare every backend against PERFT_REFERENCE; return the number of mismatches."""
+    failures = 0
+    for backend in backends or GENERATORS:
+        generate = GENERATORS[backend]
+        for name, expected in PERFT_REFERENCE.items():
+            bb, color = load_position(name)
+            for depth, count in enumerate(expected, 1):
+                nodes, seconds, nps = timed_perft(bb, color, depth, generate)
+                status = 'ok' if nodes == count else 'FAIL (expected {})'.format(count)
+                failures += nodes != count
+                log("{:10s} {:11s} depth {:2d}  nodes {:10d}  {:10.0f} nps  {}".format(
+                    backend, name, depth, nodes, nps, status))
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Count and time move generation (perft).")
+    parser.add_argument('--depth', type=int, default=4)
+    parser.add_argument('--position', default='start', choices=sorted(PERFT_POSITIONS))
+    parser.add_argument('--backend', choices=sorted(GENERATORS) + ['all'],
+                        help="move generator to run (default: bitboard; all of them with --check)")
+    parser.add_argument('--divide', action='store_true', help="print the count below each root move")
+    parser.add_argument('--check', action='store_true', help="verify the stored reference counts")
+    args = parser.parse_args(argv)
+
+    if args.backend == 'all' or (args.check and args.backend is None):
+        backends = sorted(GENERATORS)
+    else:
+        backends = [args.backend or 'bitboard']
+    if args.check:
+        failures = check(backends)
+        print("{} mismatches".format(failures))
+        return 1 if failures else 0
+
+    bb, color = load_position(args.position)
+    for backend in backends:
+        generate = GENERATORS[backend]
+        if args.divide:
+            total = 0
+            for notation, count in divide(bb, color, args.depth, generate):
+                print("{:8s} {}".format(notation, count))
+                total += count
+            print("total {}".format(total))
+        for depth in range(1, args.depth + 1):
+            nodes, seconds, nps = timed_perft(bb, color, depth, generate)
+            print("{:10s} depth {:2d}  nodes {:10d}  {:8.3f}s  {:10.0f} nps".format(backend, depth, nodes, seconds, nps))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,490 @@
+"""Alpha-beta search, iterative deepening and the background search job."""
+
+import threading
+import time
+
+from .constants import (AI_TIME_MS, HISTORY_MAX, HISTORY_STRIDE, MAX_SEARCH_DEPTH, QUIESCENCE_DEPTH, RED,
+                        WHITE, WIN_SCORE, WIN_THRESHOLD)
+from .evaluation import enhanced_evaluate
+from .layout import popcount
+from .stats import InstrumentedBitBoard
+from .tt import EXACT, LOWER, UPPER, TranspositionTable
+
+
+class SearchTimeout(Exception):
+    """Raised inside minimax when the search runs past its deadline or is stopped."""
+
+
+class SearchState:
+    """State shared by every node of one search: tables, limits and counters."""
+
+    def __init__(self, tt=None, deadline=None, stats=None, tablebase=None, batch_leaves=False, quiescence=True):
+        self.tt = tt
+        self.deadline = deadline
+        self.nodes = 0
+        self.qnodes = 0  # Quiescence nodes, not included in nodes
+        self.pv = {}  # position key -> move of the previous iteration's PV
+        self.ply = 0
+        self.killers = [[None, None] for _ in range(MAX_SEARCH_DEPTH + 1)]
+        self.history = [0] * (HISTORY_STRIDE * HISTORY_STRIDE)
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.stopped = False  # Set from another thread to abort the search
+        self.started = None  # perf_counter() when iterative_deepening began
+        self.time_limit = None  # Absolute end of the time budget, None while pondering
+        self.best = (None, None, 0)  # (score, move, depth) of the last finished iteration
+        self.stats = stats  # Optional SearchStats; None keeps the search uninstrumented
+        self.tablebase = tablebase  # Optional endgame Tablebase probed below the root
+        self.batch_leaves = batch_leaves  # Score the children of depth 1 nodes with one evaluate_batch call
+        self.quiescence = quiescence  # Resolve captures at depth 0 instead of evaluating at once
+
+    def check_time(self):
+        if self.stopped or (self.deadline is not None and time.perf_counter() >= self.deadline):
+            raise SearchTimeout()
+
+    def cutoff_rate(self):
+        """Fraction of beta cutoffs produced by the first move searched."""
+        return self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0
+
+    def record_cutoff(self, move, index, depth, ply):
+        self.cutoffs += 1
+        if self.stats is not None:
+            self.stats.record_cutoff(index)
+        if index == 0:
+            self.first_move_cutoffs += 1
+        if move[2] or ply > MAX_SEARCH_DEPTH:
+            return  # Captures are already ordered first
+        killers = self.killers[ply]
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+        slot = move[0] * HISTORY_STRIDE + move[1]
+        self.history[slot] += depth * depth
+        if self.history[slot] > HISTORY_MAX:
+            self.history = [value // 2 for value in self.history]
+
+
+def order_moves(moves, state, first=None):
+    """Sort moves in place, most promising first.
+
+    Order: the PV/TT move, captures by number of pieces taken, this ply's
+    killer moves, then quiet moves by history score.
+    """
+    killers = state.killers[state.ply] if state.ply <= MAX_SEARCH_DEPTH else (None, None)
+    history = state.history
+
+    def priority(move):
+        if move == first:
+            return 1 << 40
+        if move[2]:
+            return (1 << 30) + popcount(move[2])
+        if move == killers[0]:
+            return (1 << 25) + 1
+        if move == killers[1]:
+            return 1 << 25
+        return history[move[0] * HISTORY_STRIDE + move[1]]
+
+    moves.sort(key=priority, reverse=True)
+
+
+def principal_variation(position, max_player, tt, depth):
+    """Follow best moves stored in tt from position; return [(key, move), ...]."""
+    line = []
+    undos = []
+    for _ in range(depth):
+        color = WHITE if max_player else RED
+        key = position.key(color)
+        entry = tt.probe(key)
+        if entry is None or entry[3] is None:
+            break
+        move = position.find_move(color, *entry[3])
+        if move is None:
+            break
+        line.append((key, move))
+        undos.append(position.make_move(move))
+        max_player = not max_player
+    for undo in reversed(undos):
+        position.unmake_move(undo)
+    return line
+
+
+def iterative_deepening(position, max_player, time_ms=AI_TIME_MS, tt=None, max_depth=MAX_SEARCH_DEPTH, state=None,
+                        start_depth=1):
+    """Search deeper and deeper until time_ms runs out.
+
+    Returns (score, move, depth) from the deepest iteration that finished.
+    Depth 1 always completes so there is a move to play; a later iteration
+    that runs out of time is abandoned and the position restored. With
+    time_ms None the search runs until max_depth or until it is stopped, or
+    until another thread sets a limit with SearchJob.ponderhit(). Pass a
+    SearchState to read node and cutoff counters afterwards; if it carries
+    a SearchStats, the search runs on an InstrumentedBitBoard copy and the
+    stats are filled in per iteration.
+    """
+    start = time.perf_counter()
+    if tt is None:
+        tt = TranspositionTable()
+    tt.new_search()
+    if state is None:
+        state = SearchState()
+    state.tt = tt
+    state.started = start
+    state.time_limit = None if time_ms is None else start + time_ms / 1000.0
+    stats = state.stats
+    if stats is not None:
+        position = InstrumentedBitBoard(position, stats)
+        tt_hits, tt_probes = tt.hits, tt.hits + tt.misses + tt.collisions
+    saved = position.snapshot()
+    result = (enhanced_evaluate(position, WHITE if max_player else RED), None, 0)
+
+    for depth in range(start_depth, max_depth + 1):
+        state.deadline = state.time_limit if depth > 1 else None
+        state.ply = 0
+        iteration_start = time.perf_counter()
+        nodes_before = state.nodes
+        try:
+            score, move = minimax(position, depth, max_player, None, state=state)
+        except SearchTimeout:
+            position.unmake_move(saved)
+            break
+        if move is None:
+            break  # No legal moves, nothing deeper to find
+        result = state.best = (score, move, depth)
+        if stats is not None:
+            stats.add_iteration(depth, state.nodes - nodes_before, time.perf_counter() - iteration_start)
+        if abs(score) > WIN_THRESHOLD:
+            break  # Forced result found, deeper search cannot change it
+        state.pv = dict(principal_variation(position, max_player, tt, depth))
+        # An iteration costs several times the previous one; do not start
+        # one that has little chance of finishing.
+        limit = state.time_limit
+        if limit is not None and time.perf_counter() - start > (limit - start) / 2:
+            break
+    if stats is not None:
+        stats.finish(state.nodes, tt.hits + tt.misses + tt.collisions - tt_probes, tt.hits - tt_hits, state.qnodes)
+    return result
+
+
+class SearchJob:
+    """Run iterative_deepening in a background thread.
+
+    The job searches its own copy of the position, so the caller's board
+    can keep being drawn. poll() reports progress and the best move found
+    so far; cancel() stops the search within a few milliseconds.
+    """
+
+    def __init__(self, position, max_player, time_ms=AI_TIME_MS, tt=None, searcher=None, stats=None,
+                 tablebase=None):
+        self.position = position.copy()
+        self.max_player = max_player
+        self.time_ms = time_ms
+        self.tt = tt
+        self.searcher = searcher  # Optional ParallelSearch to run the search on
+        self.state = SearchState(stats=stats, tablebase=tablebase)
+        self.result = None
+        self.started = None
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        if self.searcher is not None:
+            stats = {}
+            result = self.searcher.search(self.position, self.max_player, self.time_ms, stats=stats, reset=False)
+            self.state.nodes = stats['nodes']
+            self.result = result
+            return
+        self.result = iterative_deepening(self.position, self.max_player, self.time_ms, self.tt, state=self.state)
+
+    def start(self):
+        self.started = time.perf_counter()
+        if self.searcher is not None:
+            self.searcher.reset()  # Here, not in the thread, so an early cancel() still stops it
+        self.thread.start()
+        return self
+
+    def done(self):
+        return self.result is not None
+
+    def poll(self):
+        """Return a progress snapshot: done, score, move, depth, nodes, qnodes, elapsed_ms."""
+        score, move, depth = self.result if self.result is not None else self.state.best
+        return {
+            'done': self.result is not None,
+            'score': score,
+            'move': move,
+            'depth': depth,
+            'nodes': self.state.nodes,
+            'qnodes': self.state.qnodes,
+            'elapsed_ms': (time.perf_counter() - self.started) * 1000 if self.started else 0.0,
+        }
+
+    def ponderhit(self, time_ms=AI_TIME_MS):
+        """Give a pondering job (time_ms None) a time budget and return it.
+
+        The budget counts from when pondering began, so a job that has
+        already thought for time_ms stops at once with its deepest finished
+        iteration.
+        """
+        state = self.state
+        self.time_ms = time_ms
+        started = state.started if state.started is not None else time.perf_counter()
+        limit = started + time_ms / 1000.0
+        state.time_limit = limit
+        if state.deadline is not None or state.best[1] is not None:
+            state.deadline = limit
+        if time.perf_counter() >= limit and state.best[1] is not None:
+            state.stopped = True
+        return self
+
+    def cancel(self, wait=True):
+        self.state.stopped = True
+        if self.searcher is not None:
+            self.searcher.stop()
+        if wait and self.thread.is_alive():
+            self.thread.join()
+
+
+def predict_reply(position, color, tt, depth=3):
+    """Guess color's next move: the transposition table's best move, else a shallow search."""
+    entry = tt.probe(position.key(color)) if tt is not None else None
+    if entry is not None and entry[3] is not None:
+        move = position.find_move(color, *entry[3])
+        if move is not None:
+            return move
+    return minimax(position.copy(), depth, color == WHITE, None, state=SearchState(tt))[1]
+
+
+def score_to_tt(score, ply):
+    """Make win scores relative to the node before storing them."""
+    if score > WIN_THRESHOLD:
+        return score + ply
+    if score < -WIN_THRESHOLD:
+        return score - ply
+    return score
+
+
+def score_from_tt(score, ply):
+    if score > WIN_THRESHOLD:
+        return score - ply
+    if score < -WIN_THRESHOLD:
+        return score + ply
+    return score
+
+
+def minimax(position, depth, max_player, game, alpha=float('-inf'), beta=float('inf'), state=None):
+    """Search position (a BitBoard) in place and return (score, best move).
+
+    Moves are (from, to, captured mask) tuples; every child is reached with
+    make_move and undone with unmake_move, so the position is left unchanged.
+    If state is given, its transposition table, endgame tablebase, time
+    limit and previous principal variation are used, and depth 0 nodes are
+    resolved with quiescence() unless state.quiescence is off.
+    """
+    color = WHITE if max_player else RED
+    alpha_orig, beta_orig = alpha, beta
+    tt = None
+    tt_move = None
+    if state is not None:
+        state.nodes += 1
+        if not state.nodes & 1023:
+            state.check_time()
+        tt = state.tt
+    ply = state.ply if state is not None else 0
+
+    # Terminal positions: a side with no pieces has lost; a side to move with
+    # no legal move is found by the leaf evaluation or the move generator.
+    if not position.red or not position.white:
+        return (WIN_SCORE - ply if position.white else ply - WIN_SCORE), None
+
+    # Positions in the endgame tablebase have an exact score; the root is
+    # still searched so there is a move to play.
+    if ply and state.tablebase is not None:
+        score = state.tablebase.score(position, color, ply)
+        if score is not None:
+            return score, None
+
+    if tt is not None:
+        key = position.key(color)
+        entry = tt.probe(key)
+        if entry is not None:
+            tt_depth, flag, score, stored = entry
+            score = score_from_tt(score, ply)
+            if stored is not None:
+                tt_move = position.find_move(color, *stored)
+            if tt_depth >= depth and (tt_move is not None or stored is None):
+                if flag == EXACT:
+                    return score, tt_move
+                if flag == LOWER:
+                    alpha = max(alpha, score)
+                else:
+                    beta = min(beta, score)
+                if alpha >= beta:
+                    return score, tt_move
+
+    if depth == 0:
+        if state is None or not state.quiescence:
+            score = position.evaluate(color, ply)
+            if tt is not None:
+                tt.store(key, depth, EXACT, score_to_tt(score, ply), None)
+            return score, None
+        score = quiescence(position, max_player, alpha, beta, state, ply)
+        if tt is not None:
+            if score <= alpha_orig:
+                flag = UPPER
+            elif score >= beta_orig:
+                flag = LOWER
+            else:
+                flag = EXACT
+            tt.store(key, depth, flag, score_to_tt(score, ply), None)
+        return score, None
+
+    moves = get_all_moves(position, color, game)
+    if not moves:
+        return (ply - WIN_SCORE if max_player else WIN_SCORE - ply), None
+    if state is not None:
+        first = state.pv.get(key) if tt is not None else None
+        if first is None or first not in moves:
+            first = tt_move
+        order_moves(moves, state, first)
+        ply = state.ply
+        state.ply = ply + 1
+
+    scores = None
+    if depth == 1 and state is not None and state.batch_leaves:
+        scores = frontier_scores(position, moves, color, ply + 1, state)
+
+    if max_player:
+        maxEval = float('-inf')
+        best_move = None
+        for index, move in enumerate(moves):
+            if scores is not None:
+                evaluation = scores[index]
+            else:
+                undo = position.make_move(move)
+                evaluation = minimax(position, depth-1, False, game, alpha, beta, state)[0]
+                position.unmake_move(undo)
+            if evaluation > maxEval:
+                maxEval = evaluation
+                best_move = move
+            alpha = max(alpha, evaluation)
+            if beta <= alpha:
+                if state is not None:
+                    state.record_cutoff(move, index, depth, ply)
+                break
+        best = maxEval
+    else:
+        minEval = float('inf')
+        best_move = None
+        for index, move in enumerate(moves):
+            if scores is not None:
+                evaluation = scores[index]
+            else:
+                undo = position.make_move(move)
+                evaluation = minimax(position, depth-1, True, game, alpha, beta, state)[0]
+                position.unmake_move(undo)
+            if evaluation < minEval:
+                minEval = evaluation
+                best_move = move
+            beta = min(beta, evaluation)
+            if beta <= alpha:
+                if state is not None:
+                    state.record_cutoff(move, index, depth, ply)
+                break
+        best = minEval
+
+    if state is not None:
+        state.ply = ply
+
+    if tt is not None:
+        if best <= alpha_orig:
+            flag = UPPER
+        elif best >= beta_orig:
+            flag = LOWER
+        else:
+            flag = EXACT
+        tt.store(key, depth, flag, score_to_tt(best, ply), best_move)
+    return best, best_move
+
+
+def quiescence(position, max_player, alpha, beta, state, ply, depth=QUIESCENCE_DEPTH):
+    """Search only captures below the horizon and return the score.
+
+    Captures are optional, so the side to move may always stand pat on the
+    static evaluation: a stand-pat score at or past beta cuts off at once.
+    Otherwise captures are tried, most pieces taken first, until none are
+    left or depth capture plies have been played. Nodes are counted in
+    state.qnodes.
+    """
+    state.qnodes += 1
+    if not state.qnodes & 1023:
+        state.check_time()
+    if not position.red or not position.white:
+        return WIN_SCORE - ply if position.white else ply - WIN_SCORE
+    color = WHITE if max_player else RED
+    best = position.evaluate(color, ply)
+    if abs(best) > WIN_THRESHOLD or depth == 0:
+        return best  # No legal move at all, or out of capture plies
+    if max_player:
+        if best >= beta:
+            return best
+        alpha = max(alpha, best)
+    else:
+        if best <= alpha:
+            return best
+        beta = min(beta, best)
+    captures = position.generate_captures(color)
+    if not captures:
+        return best
+    kings = position.kings
+    captures.sort(key=lambda move: 2 * popcount(move[2]) + popcount(move[2] & kings), reverse=True)
+    for move in captures:
+        undo = position.make_move(move)
+        score = quiescence(position, not max_player, alpha, beta, state, ply + 1, depth - 1)
+        position.unmake_move(undo)
+        if max_player:
+            if score > best:
+                best = score
+                alpha = max(alpha, score)
+        elif score < best:
+            best = score
+            beta = min(beta, score)
+        if alpha >= beta:
+            break
+    return best
+
+
+def frontier_scores(position, moves, color, ply, state):
+    """Score every child of a depth 1 node at once with evaluate_batch.
+
+    Children ply plies from the root are scored as minimax would at depth 0,
+    except that they are not looked up in or stored to the transposition
+    table. With quiescence on, only children where the side to move has no
+    capture are batched; the rest get a full-window quiescence search.
+    """
+    from .batch import evaluate_batch  # Imports NumPy, so only batching searches pay for it
+
+    other = RED if color == WHITE else WHITE
+    scores = [None] * len(moves)
+    leaves = []
+    for index, move in enumerate(moves):
+        undo = position.make_move(move)
+        if not position.red or not position.white:
+            scores[index] = WIN_SCORE - ply if position.white else ply - WIN_SCORE
+        else:
+            score = state.tablebase.score(position, other, ply) if state.tablebase is not None else None
+            if score is not None:
+                scores[index] = score
+            elif state.quiescence and position.generate_captures(other):
+                scores[index] = quiescence(position, other == WHITE, float('-inf'), float('inf'), state, ply)
+            else:
+                leaves.append((index, (position.red, position.white, position.kings)))
+        position.unmake_move(undo)
+    for (index, _), score in zip(leaves, evaluate_batch([masks for _, masks in leaves], other, ply)):
+        scores[index] = score
+    state.nodes += len(moves)
+    if state.stats is not None:
+        state.stats.leaf_evals += len(leaves)
+    return scores
+
+
+def get_all_moves(board, color, game):
+    return board.generate_moves(color)
@@ -0,0 +1,253 @@
+"""Engine-vs-engine self-play matches.
+
+Run ``python -m checkers.selfplay --help`` for the options. Two engine
+settings, A and B, play pairs of games from the same randomised opening
+with colors swapped. Every finished game is appended to a JSON lines file
+as soon as it arrives, and a win/draw/loss summary with an Elo estimate is
+printed at the end.
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .bitboard import BitBoard
+from .constants import RED, TT_SIZE_MB, WHITE
+from .evaluation import EVAL_WEIGHTS, read_weights, use_weights
+from .layout import format_move
+from .notation import GameWriter
+from .search import SearchState, iterative_deepening
+from .tt import TranspositionTable
+
+UNLIMITED_MS = 10 ** 9  # Time budget for depth-limited engines
+_worker_tables = {}
+_start_weights = dict(EVAL_WEIGHTS)  # Built-in, or from CHECKERS_EVAL_WEIGHTS; used by engines without a file
+
+
+def engine_settings(name, depth=None, time_ms=None, quiescence=True, weights=None):
+    """Describe one side of a match: a fixed depth or a time per move.
+
+    weights are evaluation weights as read_weights returns them; None plays
+    with the weights the process started with (CHECKERS_EVAL_WEIGHTS, or
+    the built-in ones).
+    """
+    if not depth and not time_ms:
+        raise ValueError("engine {} needs a depth or a time per move".format(name))
+    return {'name': name, 'depth': depth, 'time_ms': time_ms, 'quiescence': quiescence, 'weights': weights}
+
+
+def choose_move(bb, color, engine, tt=None):
+    """Return (score, move, depth) for color to move under engine's limits."""
+    use_weights(engine.get('weights') or _start_weights)
+    bb = BitBoard(bb.red, bb.white, bb.kings)  # Scored with the weights just set
+    state = SearchState(quiescence=engine.get('quiescence', True))
+    if engine['depth']:
+        return iterative_deepening(bb, color == WHITE, UNLIMITED_MS, tt, max_depth=engine['depth'], state=state)
+    return iterative_deepening(bb, color == WHITE, engine['time_ms'], tt, state=state)
+
+
+def random_opening(plies, seed):
+    """Play plies random moves from the start; return (BitBoard, color to move, moves)."""
+    rng = random.Random(seed)
+    bb = BitBoard.initial()
+    color = RED
+    moves = []
+    for _ in range(plies):
+        legal = bb.generate_moves(color)
+        if not legal:
+            break
+        move = rng.choice(legal)
+        bb.make_move(move)
+        moves.append(move)
+        color = WHITE if color == RED else RED
+    return bb, color, moves
+
+
+def play_game(index, red, white, opening_seed=0, random_plies=0, max_plies=300, tables=None):
+    """Play one game between engine settings red and white.
+
+    The game is drawn after max_plies plies or on the third repetition of a
+    position with the same side to move. tables maps engine names to their
+    own transposition tables, so neither side reuses the other's search.
+    Returns a JSON-ready record.
+    """
+    start = time.perf_counter()
+    bb, color, opening = random_opening(random_plies, opening_seed)
+    moves = list(opening)
+    seen = {}
+    result = reason = None
+    while result is None:
+        key = bb.key(color)
+        seen[key] = seen.get(key, 0) + 1
+        if seen[key] >= 3:
+            result, reason = 'draw', 'repetition'
+            break
+        if len(moves) >= max_plies:
+            result, reason = 'draw', 'move cap'
+            break
+        engine = red if color == RED else white
+        tt = tables.get(engine['name']) if tables else None
+        if tt is not None:
+            tt.new_search()
+        score, move, depth = choose_move(bb, color, engine, tt)
+        if move is None:
+            # The side to move has no pieces or no legal moves
+            result, reason = ('white' if color == RED else 'red'), 'no moves'
+            break
+        bb.make_move(move)
+        moves.append(move)
+        color = WHITE if color == RED else RED
+    return {
+        'game': index,
+        'red': red['name'],
+        'white': white['name'],
+        'result': result,
+        'reason': reason,
+        'plies': len(moves),
+        'opening_plies': len(opening),
+        'moves': [format_move(move) for move in moves],
+        'seconds': time.perf_counter() - start,
+    }
+
+
+def _play_game_worker(index, red, white, opening_seed, random_plies, max_plies, tt_mb):
+    for name in (red['name'], white['name']):
+        if name not in _worker_tables:
+            _worker_tables[name] = TranspositionTable(tt_mb)
+        _worker_tables[name].clear()
+    return play_game(index, red, white, opening_seed, random_plies, max_plies, _worker_tables)
+
+
+def elo_estimate(wins, draws, losses, z=1.96):
+    """Return (elo, low, high) for a wins/draws/losses record.
+
+    The interval comes from the standard error of the per-game score; a
+    score of 0 or 1 gives infinite bounds.
+    """
+    games = wins + draws + losses
+    if not games:
+        return 0.0, float('-inf'), float('inf')
+    score = (wins + 0.5 * draws) / games
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games
+    margin = z * math.sqrt(variance / games)
+
+    def to_elo(p):
+        if p <= 0:
+            return float('-inf')
+        if p >= 1:
+            return float('inf')
+        return -400 * math.log10(1 / p - 1)
+
+    return to_elo(score), to_elo(score - margin), to_elo(score + margin)
+
+
+def summarize(records, elapsed):
+    """Win/draw/loss from engine A's point of view, Elo and throughput."""
+    wins = draws = losses = 0
+    for record in records:
+        if record['result'] == 'draw':
+            draws += 1
+        elif record[record['result']] == 'A':
+            wins += 1
+        else:
+            losses += 1
+    elo, low, high = elo_estimate(wins, draws, losses)
+    return {
+        'games': len(records),
+        'wins': wins,
+        'draws': draws,
+        'losses': losses,
+        'elo': elo,
+        'elo_low': low,
+        'elo_high': high,
+        'games_per_minute': len(records) / elapsed * 60 if elapsed else 0.0,
+    }
+
+
+def run_match(engine_a, engine_b, games, workers=None, random_plies=4, max_plies=300, seed=0,
+              output=None, tt_mb=TT_SIZE_MB, log=None, pdn=None):
+    """Play games between engine_a and engine_b across worker processes.
+
+    Games come in pairs sharing an opening with colors swapped. Records are
+    appended to output (a path) as JSON lines and to pdn (a path) as PDN
+    games as each game finishes. Returns the summary.
+    """
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    records = []
+    out = open(output, 'a') if output else None
+    games_out = GameWriter(pdn) if pdn else None
+    try:
+        with ProcessPoolExecutor(workers) as pool:
+            futures = []
+            for index in range(games):
+                pair_seed = seed * 1000003 + index // 2
+                red, white = (engine_a, engine_b) if index % 2 == 0 else (engine_b, engine_a)
+                futures.append(pool.submit(_play_game_worker, index, red, white, pair_seed,
+                                           random_plies, max_plies, tt_mb))
+            for future in as_completed(futures):
+                record = future.result()
+                records.append(record)
+                if out:
+                    out.write(json.dumps(record) + '\n')
+                    out.flush()
+                if games_out:
+                    games_out.write(record['moves'], record['result'], {
+                        'Event': 'Self-play game {}'.format(record['game']),
+                        'Red': record['red'], 'White': record['white'], 'Termination': record['reason']})
+                if log:
+                    log("game {:5d}  {} (red) vs {} (white): {:5s} {:10s} {:3d} plies".format(
+                        record['game'], record['red'], record['white'], record['result'],
+                        record['reason'], record['plies']))
+    finally:
+        if out:
+            out.close()
+        if games_out:
+            games_out.close()
+    return summarize(records, time.perf_counter() - start)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play engine-vs-engine self-play matches.")
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument('--depth-a', type=int, help="fixed search depth for engine A")
+    parser.add_argument('--time-a', type=int, help="milliseconds per move for engine A")
+    parser.add_argument('--depth-b', type=int, help="fixed search depth for engine B")
+    parser.add_argument('--time-b', type=int, help="milliseconds per move for engine B")
+    parser.add_argument('--no-quiescence-a', action='store_true', help="evaluate engine A's leaves statically")
+    parser.add_argument('--no-quiescence-b', action='store_true', help="evaluate engine B's leaves statically")
+    parser.add_argument('--weights-a', help="evaluation weights file for engine A (default: CHECKERS_EVAL_WEIGHTS or built-in)")
+    parser.add_argument('--weights-b', help="evaluation weights file for engine B (default: CHECKERS_EVAL_WEIGHTS or built-in)")
+    parser.add_argument('--random-plies', type=int, default=4, help="random opening plies per game pair")
+    parser.add_argument('--max-plies', type=int, default=300, help="draw after this many plies")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--tt-mb', type=float, default=TT_SIZE_MB)
+    parser.add_argument('--output', help="append one JSON record per game to this file")
+    parser.add_argument('--pdn', help="append every game to this PDN file")
+    parser.add_argument('--quiet', action='store_true')
+    args = parser.parse_args(argv)
+
+    try:
+        engine_a = engine_settings('A', args.depth_a, args.time_a, not args.no_quiescence_a,
+                                   args.weights_a and read_weights(args.weights_a))
+        engine_b = engine_settings('B', args.depth_b, args.time_b, not args.no_quiescence_b,
+                                   args.weights_b and read_weights(args.weights_b))
+    except (OSError, ValueError) as exc:
+        parser.error(str(exc))
+    log = None if args.quiet else (lambda line: print(line, file=sys.stderr))
+    summary = run_match(engine_a, engine_b, args.games, args.workers, args.random_plies, args.max_plies,
+                        args.seed, args.output, args.tt_mb, log, args.pdn)
+    print("games {games}  A wins {wins}  draws {draws}  losses {losses}".format(**summary))
+    print("Elo A-B {elo:+.1f}  95% CI [{elo_low:+.1f}, {elo_high:+.1f}]".format(**summary))
+    print("throughput {games_per_minute:.1f} games/min".format(**summary))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
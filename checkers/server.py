@@ -0,0 +1,445 @@
+"""Analysis server speaking a line-based text protocol.
+
+``python -m checkers.server`` reads commands on stdin and answers on
+stdout; ``--port 7150`` serves the same protocol to any number of local TCP
+clients instead. Searches run in a pool of worker processes, each keeping
+its own transposition table warm between requests, so many analysis jobs
+run at once. ``--bench`` starts a server and drives it with a load
+generator that reports latency and throughput.
+
+Commands, one per line:
+
+    position start|fen <fen> [moves <move> ...]
+    go [depth <n>] [time <ms>] [id <tag>]
+        -> bestmove <move>|none score <s> depth <d> nodes <n> qnodes <q> time_ms <t> [id <tag>]
+        -> stopped [id <tag>]   if it was stopped before a worker started it
+    stop [id <tag>]     stop this client's searches, which then answer at once
+    fen                 -> fen <current position>
+    stats               -> stats key=value ... for the whole server
+    isready             -> readyok
+    quit
+
+go without depth or time searches for AI_TIME_MS. Replies to go arrive
+when the search ends, so a client may have several searches in flight and
+match replies by id.
+"""
+
+import argparse
+import collections
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from .bitboard import BitBoard
+from .constants import AI_TIME_MS, MAX_SEARCH_DEPTH, RED, TT_SIZE_MB, WHITE
+from .layout import format_move, parse_move
+from .notation import from_fen, to_fen
+from .parallel import SharedSearchState, bench_positions
+from .search import iterative_deepening
+from .tt import TranspositionTable
+
+DEFAULT_PORT = 7150
+STOP_SLOTS = 1024  # Most searches in flight at once; one stop flag byte each
+LATENCY_WINDOW = 10000  # Latencies kept for the percentiles in stats
+_worker_shm = None
+_worker_tt = None
+
+
+def _attach_worker(name, size_mb):
+    """Pool initializer: map the stop flags and create this worker's table."""
+    global _worker_shm, _worker_tt
+    _worker_shm = shared_memory.SharedMemory(name=name)
+    _worker_tt = TranspositionTable(size_mb)
+
+
+def _analyse_worker(slot, red, white, kings, color, depth, time_ms):
+    state = SharedSearchState(_worker_tt, _worker_shm.buf[slot:slot + 1])
+    if state.stopped:
+        return None, None, 0, 0, 0  # Stopped while queued
+    score, move, reached = iterative_deepening(BitBoard(red, white, kings), color == WHITE, time_ms, _worker_tt,
+                                               depth or MAX_SEARCH_DEPTH, state=state)
+    return score, move, reached, state.nodes, state.qnodes
+
+
+def format_stats(stats):
+    return ' '.join('{}={}'.format(key, round(value, 2) if isinstance(value, float) else value)
+                    for key, value in stats.items())
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of sorted values, or 0.0 when empty."""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+class AnalysisServer:
+    """Worker pool that runs analysis requests and keeps latency statistics.
+
+    Requests are submitted with submit() and answered through a callback
+    from the pool's result thread. Call close() (or use it as a context
+    manager) to stop the workers.
+    """
+
+    def __init__(self, workers=None, size_mb=TT_SIZE_MB):
+        self.workers = workers or os.cpu_count() or 1
+        self.shm = shared_memory.SharedMemory(create=True, size=STOP_SLOTS)
+        self.shm.buf[:STOP_SLOTS] = bytes(STOP_SLOTS)
+        self.free = list(range(STOP_SLOTS))
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.requests = 0
+        self.completed = 0
+        self.nodes = 0
+        self.latencies = collections.deque(maxlen=LATENCY_WINDOW)
+        self.executor = ProcessPoolExecutor(self.workers, initializer=_attach_worker,
+                                            initargs=(self.shm.name, size_mb))
+
+    def submit(self, bb, color, depth=None, time_ms=None, callback=None):
+        """Start a search and return its slot; callback(result dict) is called when it ends.
+
+        The result has 'stopped' set, and no score or move, if the search was
+        stopped before a worker picked it up.
+
+        Raises RuntimeError when STOP_SLOTS searches are already in flight.
+        """
+        if not depth and not time_ms:
+            time_ms = AI_TIME_MS
+        with self.lock:
+            if not self.free:
+                raise RuntimeError("too many searches in flight")
+            slot = self.free.pop()
+            self.requests += 1
+        self.shm.buf[slot] = 0
+        received = time.perf_counter()
+        future = self.executor.submit(_analyse_worker, slot, bb.red, bb.white, bb.kings, color, depth, time_ms)
+
+        def done(future):
+            # The slot is freed only after the callback, so a stop sent
+            # meanwhile cannot reach another client's search in the same slot.
+            try:
+                try:
+                    score, move, reached, nodes, qnodes = future.result()
+                except Exception as exc:  # A crashed worker must still answer the client
+                    result = {'error': "search failed: {!r}".format(exc)}
+                    nodes = qnodes = 0
+                else:
+                    result = {'move': move, 'score': score, 'depth': reached, 'nodes': nodes, 'qnodes': qnodes,
+                              'stopped': score is None}
+                latency = time.perf_counter() - received
+                result['time_ms'] = latency * 1000
+                with self.lock:
+                    self.completed += 1
+                    self.nodes += nodes + qnodes
+                    self.latencies.append(latency)
+                if callback is not None:
+                    callback(result)
+            finally:
+                with self.lock:
+                    self.free.append(slot)
+
+        future.add_done_callback(done)
+        return slot
+
+    def stop(self, slot):
+        self.shm.buf[slot] = 1
+
+    def stats(self):
+        """Return request counts, throughput and latency percentiles in milliseconds."""
+        with self.lock:
+            latencies = sorted(self.latencies)
+            uptime = time.perf_counter() - self.started
+            return {
+                'workers': self.workers,
+                'requests': self.requests,
+                'completed': self.completed,
+                'in_flight': self.requests - self.completed,
+                'uptime_s': uptime,
+                'throughput': self.completed / uptime if uptime else 0.0,
+                'latency_mean_ms': sum(latencies) / len(latencies) * 1000 if latencies else 0.0,
+                'latency_p50_ms': percentile(latencies, 0.50) * 1000,
+                'latency_p95_ms': percentile(latencies, 0.95) * 1000,
+                'latency_p99_ms': percentile(latencies, 0.99) * 1000,
+                'latency_max_ms': latencies[-1] * 1000 if latencies else 0.0,
+                'nodes': self.nodes,
+            }
+
+    def close(self):
+        self.shm.buf[:STOP_SLOTS] = b'\x01' * STOP_SLOTS
+        self.executor.shutdown(wait=True)
+        self.shm.close()
+        self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class _Job:
+    """One go request of a session; compared by identity."""
+
+    __slots__ = ('tag', 'slot')
+
+    def __init__(self, tag):
+        self.tag = tag
+        self.slot = None  # Stop flag slot, once submitted
+
+
+class Session:
+    """Protocol state of one client: its position and its searches in flight."""
+
+    def __init__(self, server, write):
+        self.server = server
+        self.write = write  # Called with one reply line, from any thread
+        self.position = BitBoard.initial()
+        self.color = RED
+        self.jobs = []  # _Job for every search in flight
+        self.lock = threading.Lock()
+        self.idle = threading.Condition(self.lock)
+
+    def handle(self, line):
+        """Run one command line; return False once the client has quit."""
+        words = line.split()
+        if not words:
+            return True
+        command, args = words[0], words[1:]
+        handler = getattr(self, 'cmd_' + command, None)
+        if handler is None:
+            self.write("error unknown command {}".format(command))
+            return True
+        try:
+            return handler(args) is not False
+        except (ValueError, IndexError, RuntimeError) as exc:
+            self.write("error {}".format(exc))
+            return True
+
+    def cmd_position(self, args):
+        if args[0] == 'start':
+            bb, color, rest = BitBoard.initial(), RED, args[1:]
+        elif args[0] == 'fen':
+            bb, color = from_fen(args[1])
+            rest = args[2:]
+        else:
+            raise ValueError("position needs start or fen")
+        if rest and rest[0] == 'moves':
+            for text in rest[1:]:
+                move = parse_move(bb, color, text)
+                if move is None:
+                    raise ValueError("illegal move {}".format(text))
+                bb.make_move(move)
+                color = WHITE if color == RED else RED
+        self.position, self.color = bb, color
+
+    def cmd_go(self, args):
+        options = dict(zip(args[::2], args[1::2]))
+        depth = int(options['depth']) if 'depth' in options else None
+        time_ms = int(options['time']) if 'time' in options else None
+        job = _Job(options.get('id'))
+        with self.lock:
+            self.jobs.append(job)
+        try:
+            slot = self.server.submit(self.position, self.color, depth, time_ms,
+                                      lambda result: self.finished(job, result))
+        except RuntimeError:
+            self.finished(job, None)
+            raise
+        with self.lock:
+            if job in self.jobs:
+                job.slot = slot
+
+    def finished(self, job, result):
+        with self.lock:
+            self.jobs.remove(job)
+            self.idle.notify_all()
+        if result is None:
+            return
+        suffix = " id {}".format(job.tag) if job.tag is not None else ''
+        if 'error' in result:
+            self.write("error {}{}".format(result['error'], suffix))
+            return
+        if result['stopped']:
+            self.write("stopped" + suffix)
+            return
+        self.write("bestmove {} score {} depth {} nodes {} qnodes {} time_ms {:.1f}{}".format(
+            format_move(result['move']) if result['move'] else 'none', result['score'], result['depth'],
+            result['nodes'], result['qnodes'], result['time_ms'], suffix))
+
+    def cmd_stop(self, args):
+        tag = args[1] if len(args) > 1 and args[0] == 'id' else None
+        with self.lock:
+            for job in self.jobs:
+                if job.slot is not None and (tag is None or job.tag == tag):
+                    self.server.stop(job.slot)
+
+    def cmd_fen(self, args):
+        self.write("fen " + to_fen(self.position, self.color))
+
+    def cmd_stats(self, args):
+        self.write("stats " + format_stats(self.server.stats()))
+
+    def cmd_isready(self, args):
+        self.write("readyok")
+
+    def cmd_quit(self, args):
+        self.cmd_stop([])
+        return False
+
+    def wait(self):
+        """Block until this client's searches have answered."""
+        with self.lock:
+            while self.jobs:
+                self.idle.wait()
+
+
+def serve_stdio(server, stdin=sys.stdin, stdout=sys.stdout):
+    """Speak the protocol on stdin/stdout until quit or end of input."""
+    lock = threading.Lock()
+
+    def write(line):
+        with lock:
+            stdout.write(line + '\n')
+            stdout.flush()
+
+    session = Session(server, write)
+    for line in stdin:
+        if not session.handle(line):
+            break
+    session.wait()
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        lock = threading.Lock()
+
+        def write(line):
+            with lock:
+                try:
+                    self.wfile.write((line + '\n').encode())
+                except OSError:
+                    pass  # The client went away; its searches still finish
+
+        session = Session(self.server.analysis, write)
+        for raw in self.rfile:
+            if not session.handle(raw.decode(errors='replace')):
+                break
+        session.wait()
+
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def serve_tcp(server, host='127.0.0.1', port=DEFAULT_PORT):
+    """Return a started TCP server speaking the protocol, one thread per client.
+
+    Call shutdown() and server_close() on it to stop it.
+    """
+    tcp = _TCPServer((host, port), _Handler)
+    tcp.analysis = server
+    threading.Thread(target=tcp.serve_forever, daemon=True).start()
+    return tcp
+
+
+def load_test(host, port, clients=4, requests=100, depth=4, time_ms=None, log=None):
+    """Drive a server with clients connections, each sending go requests in turn.
+
+    Every request sets up one of the bench_positions. Returns a summary with
+    client-side latency percentiles in milliseconds and requests per second.
+    """
+    positions = [(to_fen(bb, WHITE if max_player else RED)) for bb, max_player in bench_positions(16)]
+    go = "go" + (" depth {}".format(depth) if depth else '') + (" time {}".format(time_ms) if time_ms else '')
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    per_client = [requests // clients + (i < requests % clients) for i in range(clients)]
+
+    def client(index, count):
+        with socket.create_connection((host, port)) as conn, conn.makefile('rw') as stream:
+            for n in range(count):
+                stream.write("position fen {}\n{} id {}\n".format(positions[(index + n) % len(positions)], go, n))
+                stream.flush()
+                start = time.perf_counter()
+                reply = stream.readline().strip()
+                latency = time.perf_counter() - start
+                with lock:
+                    if reply.startswith('bestmove'):
+                        latencies.append(latency)
+                    else:
+                        errors.append(reply)
+            stream.write("quit\n")
+            stream.flush()
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(i, count)) for i, count in enumerate(per_client)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    summary = {
+        'clients': clients,
+        'requests': len(latencies),
+        'errors': len(errors),
+        'seconds': elapsed,
+        'throughput': len(latencies) / elapsed if elapsed else 0.0,
+        'latency_p50_ms': percentile(latencies, 0.50) * 1000,
+        'latency_p95_ms': percentile(latencies, 0.95) * 1000,
+        'latency_p99_ms': percentile(latencies, 0.99) * 1000,
+    }
+    if log:
+        log("clients {clients}  requests {requests}  errors {errors}  {throughput:.1f} req/s  "
+            "p50 {latency_p50_ms:.1f} ms  p95 {latency_p95_ms:.1f} ms  p99 {latency_p99_ms:.1f} ms".format(**summary))
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the engine as an analysis server.")
+    parser.add_argument('--port', type=int, help="serve local TCP clients on this port instead of stdin/stdout")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument('--tt-mb', type=float, default=TT_SIZE_MB, help="transposition table size per worker")
+    parser.add_argument('--bench', action='store_true', help="run the load generator against a server")
+    parser.add_argument('--connect', help="with --bench, host:port of a running server (default: start one)")
+    parser.add_argument('--clients', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=100)
+    parser.add_argument('--depth', type=int, default=4, help="with --bench, search depth per request")
+    parser.add_argument('--time', type=int, default=None, help="with --bench, milliseconds per request")
+    args = parser.parse_args(argv)
+    log = lambda line: print(line, file=sys.stderr)
+
+    if args.bench and args.connect:
+        host, port = args.connect.rsplit(':', 1)
+        load_test(host, int(port), args.clients, args.requests, args.depth, args.time, log)
+        return 0
+    with AnalysisServer(args.workers, args.tt_mb) as server:
+        if args.bench:
+            tcp = serve_tcp(server, args.host, 0)
+            load_test(args.host, tcp.server_address[1], args.clients, args.requests, args.depth, args.time, log)
+            log("server " + format_stats(server.stats()))
+            tcp.shutdown()
+            tcp.server_close()
+        elif args.port is not None:
+            tcp = serve_tcp(server, args.host, args.port)
+            log("listening on {}:{}".format(*tcp.server_address))
+            try:
+                threading.Event().wait()
+            except KeyboardInterrupt:
+                pass
+            tcp.shutdown()
+            tcp.server_close()
+        else:
+            serve_stdio(server)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
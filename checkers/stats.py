@@ -0,0 +1,227 @@
+"""Optional search instrumentation and profiling helpers.
+
+Statistics are only collected when a SearchStats is attached to the
+SearchState; the search then runs on an InstrumentedBitBoard that times
+move generation, evaluation and make/unmake. Without one, minimax runs on
+the plain BitBoard and pays nothing for this module.
+"""
+
+import collections
+import sys
+import threading
+import time
+
+from .bitboard import BitBoard
+
+MAX_CUTOFF_INDEX = 31  # Cutoffs at later move indexes are counted in the last bucket
+
+
+class SearchStats:
+    """Counters and timings for one search."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.finished = None
+        self.nodes = 0
+        self.qnodes = 0  # Quiescence nodes, counted apart from nodes
+        self.leaf_evals = 0
+        self.movegen_calls = 0
+        self.capturegen_calls = 0  # generate_captures calls from the quiescence search
+        self.movegen_time = 0.0
+        self.eval_time = 0.0
+        self.make_calls = 0
+        self.make_time = 0.0  # make_move and unmake_move together
+        self.cutoffs_by_index = [0] * (MAX_CUTOFF_INDEX + 1)
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.iterations = []  # one dict per finished depth
+
+    def record_cutoff(self, index):
+        self.cutoffs_by_index[min(index, MAX_CUTOFF_INDEX)] += 1
+
+    def add_iteration(self, depth, nodes, seconds):
+        previous = self.iterations[-1]['nodes'] if self.iterations else 0
+        self.iterations.append({
+            'depth': depth,
+            'nodes': nodes,
+            'seconds': seconds,
+            'ebf': nodes / previous if previous else None,
+        })
+
+    def finish(self, nodes, tt_probes=0, tt_hits=0, qnodes=0):
+        self.finished = time.perf_counter()
+        self.nodes = nodes
+        self.qnodes = qnodes
+        self.tt_probes = tt_probes
+        self.tt_hits = tt_hits
+
+    def elapsed(self):
+        return (self.finished or time.perf_counter()) - self.started
+
+    def effective_branching_factor(self):
+        """Node growth per ply over the last two finished iterations."""
+        ebfs = [it['ebf'] for it in self.iterations if it['ebf']]
+        return ebfs[-1] if ebfs else None
+
+    def as_dict(self):
+        elapsed = self.elapsed()
+        cutoffs = sum(self.cutoffs_by_index)
+        return {
+            'elapsed': elapsed,
+            'nodes': self.nodes,
+            'qnodes': self.qnodes,
+            'nps': (self.nodes + self.qnodes) / elapsed if elapsed else 0.0,
+            'leaf_evals': self.leaf_evals,
+            'movegen_calls': self.movegen_calls,
+            'capturegen_calls': self.capturegen_calls,
+            'movegen_time': self.movegen_time,
+            'eval_time': self.eval_time,
+            'make_calls': self.make_calls,
+            'make_time': self.make_time,
+            'other_time': elapsed - self.movegen_time - self.eval_time - self.make_time,
+            'cutoffs': cutoffs,
+            'cutoffs_by_index': self.cutoffs_by_index,
+            'first_move_cutoff_rate': self.cutoffs_by_index[0] / cutoffs if cutoffs else 0.0,
+            'tt_probes': self.tt_probes,
+            'tt_hits': self.tt_hits,
+            'iterations': self.iterations,
+            'ebf': self.effective_branching_factor(),
+        }
+
+    def to_json(self, **extra):
+        import json  # Imported on use, like the profilers below, to keep `import checkers` fast
+        record = self.as_dict()
+        record.update(extra)
+        return json.dumps(record)
+
+    def write_jsonl(self, path, **extra):
+        """Append this search as one JSON line; extra keys are added to the record."""
+        with open(path, 'a') as out:
+            out.write(self.to_json(**extra) + '\n')
+
+    def overlay_lines(self):
+        """Short lines suitable for drawing over the board."""
+        data = self.as_dict()
+        ebf = data['ebf']
+        return [
+            "nodes {nodes}  q {qnodes}  {nps:.0f}/s".format(**data),
+            "movegen {:.0f}ms  eval {:.0f}ms  make {:.0f}ms".format(
+                data['movegen_time'] * 1000, data['eval_time'] * 1000, data['make_time'] * 1000),
+            "tt {}/{}  cut@1 {:.0%}".format(data['tt_hits'], data['tt_probes'], data['first_move_cutoff_rate']),
+            "depth {}  ebf {}".format(self.iterations[-1]['depth'] if self.iterations else 0,
+                                      '{:.2f}'.format(ebf) if ebf else '-'),
+        ]
+
+
+class InstrumentedBitBoard(BitBoard):
+    """BitBoard that charges its work to a SearchStats."""
+
+    def __init__(self, position, stats):
+        super().__init__(position.red, position.white, position.kings)
+        self.stats = stats
+
+    def generate_moves(self, color):
+        start = time.perf_counter()
+        moves = super().generate_moves(color)
+        self.stats.movegen_time += time.perf_counter() - start
+        self.stats.movegen_calls += 1
+        return moves
+
+    def generate_captures(self, color):
+        start = time.perf_counter()
+        moves = super().generate_captures(color)
+        self.stats.movegen_time += time.perf_counter() - start
+        self.stats.capturegen_calls += 1
+        return moves
+
+    def evaluate(self, to_move=None, ply=0):
+        start = time.perf_counter()
+        score = super().evaluate(to_move, ply)
+        self.stats.eval_time += time.perf_counter() - start
+        self.stats.leaf_evals += 1
+        return score
+
+    def make_move(self, move):
+        start = time.perf_counter()
+        undo = super().make_move(move)
+        self.stats.make_time += time.perf_counter() - start
+        self.stats.make_calls += 1
+        return undo
+
+    def unmake_move(self, undo):
+        start = time.perf_counter()
+        super().unmake_move(undo)
+        self.stats.make_time += time.perf_counter() - start
+
+
+def profile_search(func, *args, output=None, sort='cumulative', top=30, **kwargs):
+    """Run func(*args, **kwargs) under cProfile and return its result.
+
+    The profile is dumped to output (a .prof file for pstats/snakeviz) if
+    given, otherwise the top entries are printed.
+    """
+    import cProfile
+    import io
+    import pstats
+
+    profiler = cProfile.Profile()
+    result = profiler.runcall(func, *args, **kwargs)
+    if output:
+        profiler.dump_stats(output)
+    else:
+        stream = io.StringIO()
+        pstats.Stats(profiler, stream=stream).sort_stats(sort).print_stats(top)
+        print(stream.getvalue())
+    return result
+
+
+class SamplingProfiler:
+    """Sample another thread's Python stack at a fixed interval.
+
+    Much cheaper than cProfile for long searches. Use as a context manager
+    around the search (thread_id defaults to the calling thread), then call
+    report() or dump() for collapsed stacks that flame graph tools read.
+    """
+
+    def __init__(self, thread_id=None, interval=0.002):
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self.samples = 0
+        self._running = False
+        self._thread = None
+
+    def _sample(self):
+        while self._running:
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append('{}:{}'.format(code.co_filename.rsplit('/', 1)[-1], code.co_name))
+                    frame = frame.f_back
+                self.stacks[';'.join(reversed(stack))] += 1
+                self.samples += 1
+            time.sleep(self.interval)
+
+    def __enter__(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._running = False
+        self._thread.join()
+
+    def report(self, top=20):
+        """Return [(function, share of samples)] for the innermost frames."""
+        leaves = collections.Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(';', 1)[-1]] += count
+        return [(name, count / self.samples) for name, count in leaves.most_common(top)] if self.samples else []
+
+    def dump(self, path):
+        with open(path, 'w') as out:
+            for stack, count in self.stacks.most_common():
+                out.write('{} {}\n'.format(stack, count))
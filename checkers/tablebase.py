@@ -0,0 +1,417 @@
+"""Endgame tablebase: retrograde generation and memory-mapped probing.
+
+``python -m checkers.tablebase --pieces 3`` solves every position with up
+to that many pieces and writes them to one file. Each material slice (red
+men, red kings, white men, white kings) is a table of one byte per position
+and side to move, indexed by the combination rank of every piece group, so
+a probe is a handful of additions and one byte read from the mmap.
+
+A byte holds the result for the side to move: 0 is a draw, 1-127 a win in
+that many plies and 0x80 | n a loss in n plies. Distances beyond 127 plies
+are stored as 127.
+"""
+
+import argparse
+import itertools
+import mmap
+import os
+import struct
+import sys
+import time
+from math import comb
+
+from .bitboard import BitBoard
+from .constants import RED, WHITE, WIN_SCORE, WIN_THRESHOLD
+from .layout import (BIT_ROW, BOARD_MASK, BOTTOM_ROW_MASK, DOWN_DIRECTIONS, STEP, TOP_ROW_MASK, UP_DIRECTIONS,
+                     bits, popcount)
+
+TB_MAGIC = b'CKTB'
+TB_VERSION = 1
+TB_HEADER = struct.Struct('<4sHHI')  # magic, version, max pieces, slice count
+TB_ENTRY = struct.Struct('<4BQQ')  # red men, red kings, white men, white kings, offset, positions per side
+TB_DRAW, TB_WIN, TB_LOSS = 0, 1, -1
+MAX_DISTANCE = 127
+MAX_PIECES = 8  # Both sides are present, so a piece group holds at most MAX_PIECES - 1
+LOSS_FLAG = 0x80
+
+# Men never stand on their own promotion row, so their groups are ranked
+# over 45 squares; kings may stand anywhere.
+SQUARES = sorted(BIT_ROW)
+RED_MAN_SQUARES = [bit for bit in SQUARES if not (TOP_ROW_MASK >> bit) & 1]
+WHITE_MAN_SQUARES = [bit for bit in SQUARES if not (BOTTOM_ROW_MASK >> bit) & 1]
+DOMAINS = (RED_MAN_SQUARES, SQUARES, WHITE_MAN_SQUARES, SQUARES)  # In slice key order
+DOMAIN_INDEX = [{bit: i for i, bit in enumerate(domain)} for domain in DOMAINS]
+BINOMIAL = [[comb(n, k) for k in range(MAX_PIECES)] for n in range(len(SQUARES) + 1)]
+
+
+def _groups(red, white, kings):
+    return red & ~kings, red & kings, white & ~kings, white & kings
+
+
+def slice_key(red, white, kings):
+    """Return the material signature (red men, red kings, white men, white kings)."""
+    return tuple(popcount(group) for group in _groups(red, white, kings))
+
+
+def slice_size(key):
+    """Number of positions per side to move in a slice, overlapping placements included."""
+    size = 1
+    for count, domain in zip(key, DOMAINS):
+        size *= BINOMIAL[len(domain)][count]
+    return size
+
+
+def position_index(key, red, white, kings):
+    """Index of a position within its slice: mixed-radix of the colex rank of each group."""
+    index = 0
+    for count, domain, domain_index, group in zip(key, DOMAINS, DOMAIN_INDEX, _groups(red, white, kings)):
+        rank = 0
+        k = 1
+        for bit in bits(group):
+            rank += BINOMIAL[domain_index[bit]][k]
+            k += 1
+        index = index * BINOMIAL[len(domain)][count] + rank
+    return index
+
+
+def slice_positions(key):
+    """Yield (red, white, kings) for every legal placement of a slice."""
+    groups = [[sum(1 << bit for bit in squares) for squares in itertools.combinations(domain, count)]
+              for count, domain in zip(key, DOMAINS)]
+    for red_men, red_kings, white_men, white_kings in itertools.product(*groups):
+        red = red_men | red_kings
+        white = white_men | white_kings
+        if popcount(red | white) != sum(key):
+            continue  # Two groups share a square
+        yield red, white, red_kings | white_kings
+
+
+def slices_for(pieces):
+    """Every slice with both sides present and at most pieces pieces, in solving order.
+
+    Captures lead to fewer pieces and promotions to fewer men, so ordering
+    by (pieces, men) solves every slice a move can reach before the slice
+    itself. Returns a list of levels; slices of one level are independent.
+    """
+    levels = {}
+    for total in range(2, pieces + 1):
+        for red_total in range(1, total):
+            white_total = total - red_total
+            for red_men in range(red_total + 1):
+                for white_men in range(white_total + 1):
+                    key = (red_men, red_total - red_men, white_men, white_total - white_men)
+                    levels.setdefault((total, red_men + white_men), []).append(key)
+    return [levels[level] for level in sorted(levels)]
+
+
+def encode(result, distance):
+    distance = min(distance, MAX_DISTANCE)
+    if result == TB_WIN:
+        return distance
+    if result == TB_LOSS:
+        return LOSS_FLAG | distance
+    return 0
+
+
+def decode(value):
+    """Return (result, distance) for a stored byte."""
+    if not value:
+        return TB_DRAW, 0
+    if value & LOSS_FLAG:
+        return TB_LOSS, value & MAX_DISTANCE
+    return TB_WIN, value
+
+
+class Tablebase:
+    """Read-only view of a tablebase file through mmap.
+
+    Only the directory is parsed when the file is opened; table bytes are
+    paged in by the OS as probes touch them.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.max_pieces, count = TB_HEADER.unpack_from(self.map, 0)
+        if magic != TB_MAGIC or version != TB_VERSION:
+            self.close()
+            raise ValueError("{} is not a version {} tablebase".format(path, TB_VERSION))
+        self.slices = {}  # slice key -> (offset, positions per side)
+        for i in range(count):
+            entry = TB_ENTRY.unpack_from(self.map, TB_HEADER.size + i * TB_ENTRY.size)
+            self.slices[entry[:4]] = entry[4:]
+        self.hits = 0
+
+    @classmethod
+    def open(cls, path):
+        """Return the tablebase at path, or None if there is no such file."""
+        return cls(path) if path and os.path.exists(path) else None
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def lookup(self, red, white, kings, color):
+        """Return (result, distance) for color to move, or None if the slice is not stored."""
+        key = slice_key(red, white, kings)
+        entry = self.slices.get(key)
+        if entry is None:
+            return None
+        offset, size = entry
+        if color == WHITE:
+            offset += size
+        return decode(self.map[offset + position_index(key, red, white, kings)])
+
+    def probe(self, bb, color):
+        """Like lookup, for a BitBoard; None also when bb has too many pieces."""
+        if popcount(bb.red | bb.white) > self.max_pieces:
+            return None
+        return self.lookup(bb.red, bb.white, bb.kings, color)
+
+    def score(self, bb, color, ply=0):
+        """Search score from WHITE's point of view for a stored position, or None."""
+        found = self.probe(bb, color)
+        if found is None:
+            return None
+        self.hits += 1
+        result, distance = found
+        if result == TB_DRAW:
+            return 0
+        score = WIN_SCORE - ply - distance
+        if result == TB_LOSS:
+            score = -score
+        return score if color == WHITE else -score
+
+
+def _predecessors(red, white, kings, mover):
+    """Yield positions before a quiet, non-promoting move of mover that leads here."""
+    own = red if mover == RED else white
+    empty = BOARD_MASK & ~(red | white)
+    for bit in bits(own):
+        king = (kings >> bit) & 1
+        if king:
+            directions = UP_DIRECTIONS + DOWN_DIRECTIONS
+        else:
+            directions = DOWN_DIRECTIONS if mover == RED else UP_DIRECTIONS  # Men only move forward
+        for d in directions:
+            frm = STEP[d][bit]
+            if frm < 0 or not (empty >> frm) & 1:
+                continue
+            moved = (1 << bit) | (1 << frm)
+            if mover == RED:
+                yield red ^ moved, white, kings ^ moved if king else kings
+            else:
+                yield red, white ^ moved, kings ^ moved if king else kings
+
+
+def solve_slice(key, lower=None):
+    """Solve one slice by retrograde analysis; return its table as bytes.
+
+    lower is a Tablebase holding every slice a capture or promotion can
+    reach. Moves that stay in the slice are propagated backwards level by
+    level of distance, so every win is found at its shortest distance and
+    every loss at its longest.
+    """
+    size = slice_size(key)
+    table = bytearray(2 * size)
+    resolved = bytearray(2 * size)
+    pending = [0] * (2 * size)  # In-slice moves not yet known to win for the opponent
+    longest = bytearray(2 * size)  # Longest loss seen so far, capped at 255
+    buckets = [[] for _ in range(2)]
+
+    def push(distance, item):
+        while len(buckets) <= distance:
+            buckets.append([])
+        buckets[distance].append(item)
+
+    bb = BitBoard()
+    for red, white, kings in slice_positions(key):
+        index = position_index(key, red, white, kings)
+        for side, color, other in ((0, RED, WHITE), (size, WHITE, RED)):
+            bb.red, bb.white, bb.kings = red, white, kings
+            moves = bb.generate_moves(color)
+            win = quiet = 0
+            draw = False
+            worst = 0
+            for move in moves:
+                undo = bb.make_move(move)
+                child = (bb.red, bb.white, bb.kings)
+                bb.unmake_move(undo)
+                if not move[2] and slice_key(*child) == key:
+                    quiet += 1
+                    continue
+                # Captures and promotions leave the slice
+                if not (child[0] if color == WHITE else child[1]):
+                    result, distance = TB_LOSS, 0  # Last opposing piece captured
+                else:
+                    result, distance = lower.lookup(*child, other)
+                if result == TB_LOSS:
+                    win = distance + 1 if not win else min(win, distance + 1)
+                elif result == TB_WIN:
+                    worst = max(worst, distance + 1)
+                else:
+                    draw = True
+            slot = side + index
+            longest[slot] = worst
+            if win:
+                push(win, (slot, TB_WIN, red, white, kings, color))
+                quiet += 1  # Never counted down to a loss
+            elif draw:
+                quiet += 1
+            elif not quiet:
+                push(worst, (slot, TB_LOSS, red, white, kings, color))
+            pending[slot] = quiet
+
+    distance = 0
+    while distance < len(buckets):
+        for slot, result, red, white, kings, color in buckets[distance]:
+            if resolved[slot]:
+                continue
+            resolved[slot] = 1
+            table[slot] = encode(result, distance)
+            mover = WHITE if color == RED else RED
+            side = size if mover == WHITE else 0
+            for prev in _predecessors(red, white, kings, mover):
+                prev_slot = side + position_index(key, *prev)
+                if resolved[prev_slot]:
+                    continue
+                if result == TB_LOSS:
+                    push(distance + 1, (prev_slot, TB_WIN) + prev + (mover,))
+                    continue
+                longest[prev_slot] = max(longest[prev_slot], min(distance + 1, 255))
+                pending[prev_slot] -= 1
+                if not pending[prev_slot]:
+                    push(max(longest[prev_slot], distance + 1), (prev_slot, TB_LOSS) + prev + (mover,))
+        buckets[distance] = None
+        distance += 1
+    return bytes(table)
+
+
+def write_tablebase(path, pieces, tables):
+    """Write tables ({slice key: bytes}) to path atomically."""
+    keys = sorted(tables)
+    offset = TB_HEADER.size + TB_ENTRY.size * len(keys)
+    temp = path + '.tmp'
+    with open(temp, 'wb') as out:
+        out.write(TB_HEADER.pack(TB_MAGIC, TB_VERSION, pieces, len(keys)))
+        for key in keys:
+            out.write(TB_ENTRY.pack(*key, offset, len(tables[key]) // 2))
+            offset += len(tables[key])
+        for key in keys:
+            out.write(tables[key])
+    os.replace(temp, path)
+
+
+def _solve_slice_worker(key, path):
+    lower = Tablebase.open(path)
+    try:
+        start = time.perf_counter()
+        return key, solve_slice(key, lower), time.perf_counter() - start
+    finally:
+        if lower is not None:
+            lower.close()
+
+
+def generate(path, pieces=3, workers=None, log=None):
+    """Solve every slice with up to pieces pieces and write them to path.
+
+    Slices of one level are solved in parallel worker processes; after each
+    level the file is rewritten so the next level's workers can probe it.
+    """
+    from concurrent.futures import ProcessPoolExecutor  # Only generation needs worker processes
+
+    if not 2 <= pieces <= MAX_PIECES:
+        raise ValueError("tablebases hold 2 to {} pieces, not {}".format(MAX_PIECES, pieces))
+    tables = {}
+    start = time.perf_counter()
+    with ProcessPoolExecutor(workers or os.cpu_count() or 1) as pool:
+        for level in slices_for(pieces):
+            level_pieces = sum(level[0])
+            for key, table, seconds in pool.map(_solve_slice_worker, level, [path if tables else None] * len(level)):
+                tables[key] = table
+                if log:
+                    log("slice {}  {:9d} positions  {}  {:.1f}s".format(key, len(table), summarize(table), seconds))
+            write_tablebase(path, level_pieces, tables)
+    if log:
+        log("wrote {} slices to {} in {:.1f}s".format(len(tables), path, time.perf_counter() - start))
+    return tables
+
+
+def summarize(table):
+    """Return 'wins W  losses L  draws D' for a slice table (draws include unused indexes)."""
+    losses = sum(table.count(LOSS_FLAG | n) for n in range(MAX_DISTANCE + 1))
+    draws = table.count(0)
+    return "wins {}  losses {}  draws {}".format(len(table) - losses - draws, losses, draws)
+
+
+def verify(tablebase, positions=200, depth=7, seed=0, log=print):
+    """Check random stored positions against a plain alpha-beta search.
+
+    Positions decided within depth plies must get the same win/loss score
+    from minimax, and drawn positions must not look decided to a depth
+    plies search; returns the number of disagreements.
+    """
+    import random
+
+    from .search import SearchState, minimax
+
+    rng = random.Random(seed)
+    failures = checked = 0
+    keys = [key for key in tablebase.slices if sum(key) <= tablebase.max_pieces]
+    while checked < positions:
+        key = rng.choice(keys)
+        placement = [rng.sample(domain, count) for count, domain in zip(key, DOMAINS)]
+        squares = [bit for group in placement for bit in group]
+        if len(set(squares)) != len(squares):
+            continue
+        masks = [sum(1 << bit for bit in group) for group in placement]
+        bb = BitBoard(masks[0] | masks[1], masks[2] | masks[3], masks[1] | masks[3])
+        color = rng.choice((RED, WHITE))
+        result, distance = tablebase.probe(bb, color)
+        if distance > depth:
+            continue
+        checked += 1
+        expected = tablebase.score(bb, color)
+        if result == TB_DRAW:
+            # A draw must not look decided to a search of any depth
+            score, _ = minimax(bb, depth, color == WHITE, None, state=SearchState())
+            if abs(score) > WIN_THRESHOLD:
+                failures += 1
+                log("mismatch {} {} to move: tablebase draw, search {}".format(
+                    key, 'red' if color == RED else 'white', score))
+            continue
+        score, _ = minimax(bb, distance, color == WHITE, None, state=SearchState())
+        if score != expected:
+            failures += 1
+            log("mismatch {} {} to move: tablebase {} search {}".format(
+                key, 'red' if color == RED else 'white', expected, score))
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate or check an endgame tablebase.")
+    parser.add_argument('--pieces', type=int, default=3, choices=range(2, MAX_PIECES + 1), metavar='N',
+                        help="solve positions with up to N pieces, 2 to {}".format(MAX_PIECES))
+    parser.add_argument('--output', default='endgame.tb')
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument('--verify', type=int, metavar='N', help="compare N decided positions with a search")
+    args = parser.parse_args(argv)
+
+    if args.verify:
+        with Tablebase(args.output) as tablebase:
+            failures = verify(tablebase, args.verify)
+        print("{} mismatches".format(failures))
+        return 1 if failures else 0
+    generate(args.output, args.pieces, args.workers, log=lambda line: print(line, file=sys.stderr))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""Transposition table shared by the searches."""
+
+import mmap
+
+from .constants import TT_SIZE_MB
+
+
+# Transposition table bound types
+EXACT, LOWER, UPPER = 0, 1, 2
+MASK64 = (1 << 64) - 1
+
+
+class TranspositionTable:
+    """Fixed-size hash table of search results keyed by Zobrist key.
+
+    Entries live in flat 64-bit arrays over one buffer, two slots per bucket:
+    slot 0 keeps the deepest result seen (replaced by deeper or equal-depth
+    results, or by anything from an older search), slot 1 is always replaced.
+    Each slot stores key ^ info ^ score as its check word, so an entry only
+    verifies if all three words come from the same store: a torn write, or
+    two processes writing one slot of a shared table at once, reads as a
+    miss.
+    """
+
+    SLOT_BYTES = 24  # key, score, info
+
+    def __init__(self, size_mb=TT_SIZE_MB, buffer=None):
+        slots = max(2, int(size_mb * 1024 * 1024) // self.SLOT_BYTES) & ~1
+        if buffer is None:
+            # Anonymous memory is zeroed by the OS page by page as it is
+            # touched, so a large table costs nothing to create
+            buffer = mmap.mmap(-1, slots * self.SLOT_BYTES)
+        self.buffer = buffer
+        view = memoryview(buffer)
+        self.keys = view[:slots * 8].cast('Q')
+        self.scores = view[slots * 8:slots * 16].cast('q')
+        self.infos = view[slots * 16:slots * 24].cast('Q')
+        self.slots = slots
+        self.buckets = slots // 2
+        self.age = 0
+        self.hits = self.misses = self.collisions = self.stores = 0
+
+    @staticmethod
+    def _pack(depth, flag, move, age):
+        # info: depth 8 | flag 2 | has move 1 | from 6 | to 6 | age 6 | used 1
+        info = depth | flag << 8 | age << 23 | 1 << 29
+        if move is not None:
+            info |= 1 << 10 | move[0] << 11 | move[1] << 17
+        return info
+
+    def new_search(self):
+        """Mark existing entries as old so the depth-preferred slots can be reused."""
+        self.age = (self.age + 1) & 63
+
+    def clear(self):
+        self.buffer[:] = bytes(len(self.buffer))
+        self.hits = self.misses = self.collisions = self.stores = 0
+
+    def probe(self, key):
+        """Return (depth, flag, score, move) for key, or None on a miss.
+
+        move is a (from, to) pair or None; callers must check it is legal.
+        """
+        index = (key % self.buckets) * 2
+        keys, scores, infos = self.keys, self.scores, self.infos
+        for slot in (index, index + 1):
+            info = infos[slot]
+            score = scores[slot]
+            if keys[slot] ^ info ^ (score & MASK64) == key:
+                self.hits += 1
+                move = (info >> 11 & 63, info >> 17 & 63) if info >> 10 & 1 else None
+                return info & 255, info >> 8 & 3, score, move
+        if infos[index] or infos[index + 1]:
+            self.collisions += 1
+        else:
+            self.misses += 1
+        return None
+
+    def store(self, key, depth, flag, score, move):
+        index = (key % self.buckets) * 2
+        keys, scores, infos = self.keys, self.scores, self.infos
+        info = self._pack(depth, flag, move, self.age)
+        old = infos[index]
+        same = keys[index] ^ old ^ (scores[index] & MASK64) == key
+        if same or not old or depth >= old & 255 or (old >> 23 & 63) != self.age:
+            slot = index
+            if old and not same:
+                # Keep the displaced entry around in the always-replace slot
+                keys[index + 1] = keys[index]
+                scores[index + 1] = scores[index]
+                infos[index + 1] = old
+        else:
+            slot = index + 1
+        keys[slot] = key ^ info ^ (score & MASK64)
+        scores[slot] = score
+        infos[slot] = info
+        self.stores += 1
+
+    def stats(self):
+        probes = self.hits + self.misses + self.collisions
+        return {
+            'size_mb': self.slots * self.SLOT_BYTES / (1024 * 1024),
+            'entries': self.slots,
+            'probes': probes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'collisions': self.collisions,
+            'stores': self.stores,
+            'hit_rate': self.hits / probes if probes else 0.0,
+        }
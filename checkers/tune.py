@@ -0,0 +1,210 @@
+"""Texel-style tuning of the evaluation weights from recorded games.
+
+Two steps, both streaming in fixed-size chunks so memory stays bounded
+however many positions there are:
+
+    python -m checkers.tune extract --games games.pdn selfplay.jsonl --output positions.tdb
+    python -m checkers.tune fit --data positions.tdb --output eval_weights.json
+
+extract replays every game, keeps the quiet positions (no capture for the
+side to move) past the opening and appends one row per position: the
+extract_features() column of every weight and the game's result. fit
+predicts each result as sigmoid(evaluation / scale) and lowers the mean
+squared error by mini-batch gradient descent (Adam) over the memory-mapped
+rows. The engine only plays with the written weights when asked: pass the
+file to self-play with --weights-a/--weights-b to measure it against the
+defaults, or name it in the CHECKERS_EVAL_WEIGHTS environment variable.
+"""
+
+import argparse
+import os
+import struct
+import sys
+import time
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - NumPy is an optional dependency
+    np = None
+
+from .batch import TERMS, extract_features
+from .constants import EVAL_WEIGHTS_PATH
+from .evaluation import EVAL_WEIGHTS, write_weights
+from .notation import game_records, replay
+
+DATA_MAGIC = b'CKTD'
+DATA_VERSION = 1
+DATA_HEADER = struct.Struct('<4sHH')  # magic, version, number of terms
+RESULT_CODES = {'red': 0, 'draw': 1, 'white': 2}  # Stored per row; the target is code / 2
+CHUNK_ROWS = 1 << 16  # Rows extracted, or read back, at a time
+FROZEN_TERMS = ('piece',)  # Fixes the unit of the weights; the scale absorbs the rest
+
+
+def row_dtype(terms=len(TERMS)):
+    return np.dtype([('features', '<i2', (terms,)), ('result', 'u1')])
+
+
+def quiet_positions(paths, skip_plies=10):
+    """Yield ((red, white, kings), result code) for the quiet positions of every decided or drawn game."""
+    for path in paths:
+        for game in game_records(path):
+            code = RESULT_CODES.get(game['result'])
+            if code is None:
+                continue  # Unfinished game
+            try:
+                for ply, (bb, color, move) in enumerate(replay(game)):
+                    if ply >= skip_plies and not bb.generate_captures(color):
+                        yield (bb.red, bb.white, bb.kings), code
+            except ValueError:
+                continue  # Keep the positions before an illegal move, skip the rest
+
+
+def extract(paths, output, skip_plies=10, chunk=CHUNK_ROWS, append=False, log=None):
+    """Append the features of the quiet positions in paths to output; return the number of rows."""
+    dtype = row_dtype()
+    if append and os.path.exists(output):
+        with open(output, 'rb') as data:
+            magic, version, terms = DATA_HEADER.unpack(data.read(DATA_HEADER.size))
+        if (magic, version, terms) != (DATA_MAGIC, DATA_VERSION, len(TERMS)):
+            raise ValueError("{} was written for different evaluation terms".format(output))
+        out = open(output, 'ab')
+    else:
+        out = open(output, 'wb')
+        out.write(DATA_HEADER.pack(DATA_MAGIC, DATA_VERSION, len(TERMS)))
+    count = 0
+    start = time.perf_counter()
+    with out:
+        pending = []
+        for row in quiet_positions(paths, skip_plies):
+            pending.append(row)
+            if len(pending) == chunk:
+                count += _write_rows(out, pending, dtype)
+                pending = []
+                if log:
+                    log("{:10d} positions  {:.0f}/s".format(count, count / (time.perf_counter() - start)))
+        count += _write_rows(out, pending, dtype)
+    return count
+
+
+def _write_rows(out, rows, dtype):
+    if not rows:
+        return 0
+    block = np.empty(len(rows), dtype=dtype)
+    block['features'] = extract_features([masks for masks, _ in rows])
+    block['result'] = [code for _, code in rows]
+    out.write(block.tobytes())
+    return len(rows)
+
+
+def open_data(path):
+    """Memory-map a file written by extract(); returns a structured array of rows."""
+    with open(path, 'rb') as data:
+        magic, version, terms = DATA_HEADER.unpack(data.read(DATA_HEADER.size))
+    if magic != DATA_MAGIC or version != DATA_VERSION:
+        raise ValueError("{} is not a version {} tuning data file".format(path, DATA_VERSION))
+    if terms != len(TERMS):
+        raise ValueError("{} has {} terms, the evaluation has {}".format(path, terms, len(TERMS)))
+    return np.memmap(path, dtype=row_dtype(terms), mode='r', offset=DATA_HEADER.size)
+
+
+def _chunk(rows, start, chunk):
+    block = rows[start:start + chunk]
+    return block['features'].astype(np.float64), block['result'] / 2.0
+
+
+def loss(rows, weights, scales, chunk=CHUNK_ROWS):
+    """Mean squared error of sigmoid(evaluation / scale) for every scale at once."""
+    scales = np.asarray(scales, dtype=np.float64)
+    total = np.zeros(len(scales))
+    for start in range(0, len(rows), chunk):
+        features, target = _chunk(rows, start, chunk)
+        evaluation = features @ weights
+        predicted = 1.0 / (1.0 + np.exp(-evaluation[:, None] / scales[None, :]))
+        total += ((target[:, None] - predicted) ** 2).sum(axis=0)
+    return total / max(1, len(rows))
+
+
+def fit_scale(rows, weights, low=50.0, high=20000.0, steps=60):
+    """Scale that best maps the current evaluation to results, by a log-spaced search."""
+    scales = np.geomspace(low, high, steps)
+    errors = loss(rows, weights, scales)
+    return float(scales[int(np.argmin(errors))])
+
+
+def fit(rows, weights=EVAL_WEIGHTS, epochs=10, batch=4096, rate=1.0, scale=None, frozen=FROZEN_TERMS,
+        chunk=CHUNK_ROWS, seed=0, log=None):
+    """Fit the weights to the rows of open_data(); return (weights dict, scale, loss before, loss after).
+
+    Each epoch visits the chunks in random order and shuffles the rows of
+    each chunk into mini-batches; only one chunk is in memory at a time.
+    """
+    rng = np.random.default_rng(seed)
+    w = np.array([weights[term] for term in TERMS], dtype=np.float64)
+    trainable = np.array([term not in frozen for term in TERMS], dtype=np.float64)
+    if scale is None:
+        scale = fit_scale(rows, w)
+    before = float(loss(rows, w, [scale])[0])
+    if log:
+        log("{} positions  scale {:.0f}  loss {:.6f}".format(len(rows), scale, before))
+    m = np.zeros_like(w)
+    v = np.zeros_like(w)
+    step = 0
+    starts = list(range(0, len(rows), chunk))
+    for epoch in range(epochs):
+        rng.shuffle(starts)
+        for start in starts:
+            features, target = _chunk(rows, start, chunk)
+            order = rng.permutation(len(target))
+            for first in range(0, len(order), batch):
+                index = order[first:first + batch]
+                x, y = features[index], target[index]
+                predicted = 1.0 / (1.0 + np.exp(-(x @ w) / scale))
+                gradient = x.T @ (-2.0 * (y - predicted) * predicted * (1.0 - predicted) / scale) / len(index)
+                step += 1
+                m = 0.9 * m + 0.1 * gradient
+                v = 0.999 * v + 0.001 * gradient * gradient
+                w -= rate * trainable * (m / (1 - 0.9 ** step)) / (np.sqrt(v / (1 - 0.999 ** step)) + 1e-12)
+        if log:
+            log("epoch {:3d}  loss {:.6f}".format(epoch + 1, float(loss(rows, w, [scale])[0])))
+    after = float(loss(rows, np.round(w), [scale])[0])
+    return {term: int(round(value)) for term, value in zip(TERMS, w)}, scale, before, after
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tune the evaluation weights on recorded games.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    extract_args = commands.add_parser('extract', help="write the features of recorded positions")
+    extract_args.add_argument('--games', nargs='+', required=True, help="PDN (.pdn) or self-play JSON lines files")
+    extract_args.add_argument('--output', default='positions.tdb')
+    extract_args.add_argument('--skip-plies', type=int, default=10, help="opening plies left out of every game")
+    extract_args.add_argument('--append', action='store_true', help="add to an existing data file")
+    fit_args = commands.add_parser('fit', help="fit the weights and write them for the evaluation")
+    fit_args.add_argument('--data', default='positions.tdb')
+    fit_args.add_argument('--output', default=EVAL_WEIGHTS_PATH)
+    fit_args.add_argument('--epochs', type=int, default=10)
+    fit_args.add_argument('--batch', type=int, default=4096, help="positions per gradient step")
+    fit_args.add_argument('--rate', type=float, default=1.0, help="step size, in hundredths per step")
+    fit_args.add_argument('--scale', type=float, default=None, help="sigmoid scale (default: fitted first)")
+    fit_args.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    if np is None:
+        parser.error("tuning needs NumPy")
+    log = lambda line: print(line, file=sys.stderr)
+
+    if args.command == 'extract':
+        count = extract(args.games, args.output, args.skip_plies, append=args.append, log=log)
+        log("wrote {} positions to {}".format(count, args.output))
+        return 0
+    rows = open_data(args.data)
+    weights, scale, before, after = fit(rows, epochs=args.epochs, batch=args.batch, rate=args.rate,
+                                        scale=args.scale, seed=args.seed, log=log)
+    for term in TERMS:
+        log("{:14s} {:5d} -> {:5d}".format(term, EVAL_WEIGHTS[term], weights[term]))
+    log("loss {:.6f} -> {:.6f} (scale {:.0f})".format(before, after, scale))
+    write_weights(args.output, weights)
+    log("wrote {}".format(args.output))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())